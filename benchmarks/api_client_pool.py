@@ -0,0 +1,119 @@
+"""Per-call latency of github_search with a fresh client vs. the shared pooled client.
+
+Starts a local stub of the GitHub search endpoint and calls github_search from
+tools/api-integration-pattern.py against it, first opening a new
+httpx.AsyncClient per call (the previous behaviour) and then through the
+shared pooled client. The stub sleeps for --handshake-ms on every new
+connection to stand in for the TCP/TLS setup cost of a real remote API.
+github_search's rate limiter is opened up so only connection reuse is measured.
+
+    python benchmarks/api_client_pool.py --calls 200 --concurrency 10
+"""
+import argparse
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import numpy as np
+
+from harness import load_example, quiet_request_logs
+
+SEARCH_RESPONSE = json.dumps({
+    "total_count": 5,
+    "items": [
+        {"full_name": f"octo/repo-{i}", "description": "Stub repository", "stargazers_count": i * 10}
+        for i in range(5)
+    ]
+}).encode()
+
+def start_stub_server(handshake_ms):
+    """Serve a canned search response over keep-alive HTTP/1.1 on a free local port."""
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True  # headers and body are separate writes
+
+        def setup(self):
+            # Runs once per connection, so only new connections pay the delay
+            time.sleep(handshake_ms / 1000)
+            super().setup()
+
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(SEARCH_RESPONSE)))
+            self.end_headers()
+            self.wfile.write(SEARCH_RESPONSE)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+async def fresh_client_search(module, query):
+    """The previous github_search request path: a new client (and connection) per call."""
+    async with httpx.AsyncClient() as client:
+        response = await client.get(
+            f"{module.GITHUB_API_URL}/search/repositories",
+            params={"q": query, "per_page": 5},
+            headers={"Accept": "application/vnd.github.v3+json"}
+        )
+        return response.json()
+
+async def run_calls(search, calls, concurrency):
+    """Issue calls with at most `concurrency` in flight, returning per-call latencies in ms."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one_call(i):
+        async with semaphore:
+            start = time.perf_counter()
+            await search(f"query {i}")
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one_call(i) for i in range(calls)))
+    return np.array(latencies), time.perf_counter() - start
+
+async def benchmark(args):
+    server = start_stub_server(args.handshake_ms)
+    module = load_example("tools/api-integration-pattern.py", "api_integration")
+    module.GITHUB_API_URL = f"http://127.0.0.1:{server.server_address[1]}"
+    quiet_request_logs()
+
+    # github_search waits on a 10 req/s token bucket; lift it so it does not cap the pooled client
+    module.scheduler.rate = module.scheduler.burst = module.scheduler.tokens = 1e9
+
+    modes = [
+        ("per-call client", lambda query: fresh_client_search(module, query)),
+        ("pooled client", lambda query: module.github_search(query)),
+    ]
+
+    print(f"{args.calls} calls, concurrency {args.concurrency}, {args.handshake_ms} ms connection setup\n")
+    print(f"{'mode':<18}{'mean ms':>10}{'p50 ms':>10}{'p99 ms':>10}{'calls/s':>10}")
+    async with module.lifespan(module.mcp):
+        for name, search in modes:
+            await run_calls(search, args.concurrency, args.concurrency)  # warm up
+            latencies, elapsed = await run_calls(search, args.calls, args.concurrency)
+            print(
+                f"{name:<18}{latencies.mean():>10.2f}{np.percentile(latencies, 50):>10.2f}"
+                f"{np.percentile(latencies, 99):>10.2f}{args.calls / elapsed:>10.0f}"
+            )
+
+    server.shutdown()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--handshake-ms", type=float, default=20.0,
+                        help="delay added to every new connection (0 to measure raw localhost cost)")
+    asyncio.run(benchmark(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""Tail latency of the api:// weather resource with and without hedging and circuit breaking.
+
+Points resources/api-resources.py at a local fake OpenWeatherMap that answers
+most requests in a few milliseconds but stalls a fraction of them, and
+compares read latency percentiles with hedged requests off and on. It then
+switches the fake upstream into an outage (slow 503s) and compares reads
+with the circuit breaker disabled and enabled.
+
+    python benchmarks/api_tail_latency.py --reads 400 --slow-fraction 0.05
+"""
+import argparse
+import asyncio
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from harness import load_example, quiet_request_logs
+
+WEATHER_RESPONSE = json.dumps({
+    "name": "Stub City",
+    "sys": {"country": "XX"},
+    "main": {"temp": 20.0, "feels_like": 19.0, "temp_min": 18.0, "temp_max": 22.0, "humidity": 50},
+    "wind": {"speed": 3.0, "deg": 180},
+    "weather": [{"description": "clear sky"}]
+}).encode()
+
+def start_fake_upstream(behaviour):
+    """Serve weather responses whose latency and status follow the mutable behaviour dict."""
+    class FakeUpstreamHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            if behaviour["outage"]:
+                time.sleep(behaviour["outage_delay"])
+                body, status = b"{}", 503
+            else:
+                slow = random.random() < behaviour["slow_fraction"]
+                time.sleep(behaviour["slow_delay"] if slow else behaviour["base_delay"] * random.uniform(0.5, 1.5))
+                body, status = WEATHER_RESPONSE, 200
+
+            try:
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # the client cancelled the losing half of a hedged request
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeUpstreamHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+async def run_reads(module, label, reads, concurrency):
+    """Read api://weather/current for distinct cities (so nothing is cached); return latencies and errors."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+
+    async def one_read(i):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            payload = await module.current_weather(f"{label}-{i}")
+            latencies.append((time.perf_counter() - start) * 1000)
+            errors += payload.startswith("Error")
+
+    await asyncio.gather(*(one_read(i) for i in range(reads)))
+    return np.array(latencies), errors
+
+def report(name, latencies, errors, upstream):
+    print(
+        f"{name:<22}{latencies.mean():>9.1f}{np.percentile(latencies, 50):>9.1f}"
+        f"{np.percentile(latencies, 99):>9.1f}{latencies.max():>9.1f}{errors:>8}"
+        f"{upstream.hedged:>8}{upstream.rejected:>10}"
+    )
+
+async def benchmark(args):
+    behaviour = {
+        "outage": False,
+        "outage_delay": args.outage_delay_ms / 1000,
+        "slow_fraction": args.slow_fraction,
+        "slow_delay": args.slow_delay_ms / 1000,
+        "base_delay": args.base_delay_ms / 1000
+    }
+    server = start_fake_upstream(behaviour)
+    module = load_example("resources/api-resources.py", "api_resources")
+    module.WEATHER_API_URL = f"http://127.0.0.1:{server.server_address[1]}"
+    quiet_request_logs()
+
+    header = f"{'':<22}{'mean ms':>9}{'p50 ms':>9}{'p99 ms':>9}{'max ms':>9}{'errors':>8}{'hedged':>8}{'rejected':>10}"
+
+    print(f"Tail latency: {args.reads} reads, {args.slow_fraction:.0%} stalled for {args.slow_delay_ms:.0f} ms\n")
+    print(header)
+    for name, percentile in [("no hedging", None), (f"hedge at p{args.hedge_percentile}", args.hedge_percentile)]:
+        upstream = module.Upstream("openweathermap", hedge_percentile=percentile)
+        module.upstreams["openweathermap"] = upstream
+        await run_reads(module, f"warmup-{name}", 50, args.concurrency)
+        latencies, errors = await run_reads(module, name, args.reads, args.concurrency)
+        report(name, latencies, errors, upstream)
+
+    behaviour["outage"] = True
+    print(f"\nOutage: {args.outage_reads} reads against 503s after {args.outage_delay_ms:.0f} ms\n")
+    print(header)
+    for name, threshold in [("no circuit breaker", 10 ** 9), ("circuit breaker", 5)]:
+        upstream = module.Upstream("openweathermap", failure_threshold=threshold)
+        module.upstreams["openweathermap"] = upstream
+        latencies, errors = await run_reads(module, f"outage-{name}", args.outage_reads, args.concurrency)
+        report(name, latencies, errors, upstream)
+
+    await module.get_http_client().aclose()
+    server.shutdown()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--reads", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--base-delay-ms", type=float, default=10.0)
+    parser.add_argument("--slow-fraction", type=float, default=0.05)
+    parser.add_argument("--slow-delay-ms", type=float, default=500.0)
+    parser.add_argument("--hedge-percentile", type=int, default=95)
+    parser.add_argument("--outage-reads", type=int, default=100)
+    parser.add_argument("--outage-delay-ms", type=float, default=1000.0)
+    asyncio.run(benchmark(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,16 @@
+"""Helpers shared by the benchmark scripts (not a benchmark itself)."""
+import importlib.util
+import logging
+from pathlib import Path
+
+def load_example(relative_path, module_name):
+    """Import one of the example servers (their file names are not importable)."""
+    path = Path(__file__).resolve().parent.parent / relative_path
+    spec = importlib.util.spec_from_file_location(module_name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def quiet_request_logs():
+    """Hide httpx's per-request log lines, which FastMCP's logging setup shows at INFO."""
+    logging.getLogger("httpx").setLevel(logging.WARNING)
@@ -0,0 +1,75 @@
+"""Recall vs. latency of the IVF index in tools/semantic-search-pattern.py.
+
+Builds a synthetic clustered corpus, runs the same queries through exact
+(flat) search and through an IVF index at increasing nprobe values, and
+reports recall@k against the exact results alongside per-query latency.
+
+    python benchmarks/semantic_search_ann.py --num-vectors 200000 --dim 128
+"""
+import argparse
+import time
+
+import numpy as np
+
+from harness import load_example
+
+def make_corpus(num_vectors, dim, num_clusters, seed=0):
+    """Gaussian blobs around random centers, closer to real embeddings than uniform noise."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((num_clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, num_clusters, num_vectors)
+    return centers[labels] + 0.5 * rng.standard_normal((num_vectors, dim)).astype(np.float32)
+
+def timed_search(db, queries, top_k, **params):
+    """Run every query, returning the result ids and per-query latencies in ms."""
+    results, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        hits = db.search(query, top_k=top_k, **params)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append({hit["id"] for hit in hits})
+    return results, np.array(latencies)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--num-vectors", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--nlist", type=int, default=1024)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32, 64])
+    args = parser.parse_args()
+    
+    semantic_search = load_example("tools/semantic-search-pattern.py", "semantic_search_pattern")
+    
+    vectors = make_corpus(args.num_vectors, args.dim, num_clusters=args.nlist // 4)
+    ids = np.arange(1, args.num_vectors + 1)
+    documents = [{"id": int(i), "title": f"Document {i}", "content": ""} for i in ids]
+    
+    # Queries are perturbed corpus vectors so they land near real clusters
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.choice(args.num_vectors, args.queries)]
+    queries = queries + 0.5 * rng.standard_normal(queries.shape).astype(np.float32)
+    
+    exact_db = semantic_search.VectorDB(documents, ids, vectors, index_type="flat")
+    
+    start = time.perf_counter()
+    ivf_db = semantic_search.VectorDB(documents, ids, vectors, index_type="ivf", nlist=args.nlist)
+    build_seconds = time.perf_counter() - start
+    
+    truth, exact_latency = timed_search(exact_db, queries, args.top_k)
+    
+    print(f"{args.num_vectors} vectors x {args.dim} dims, {args.queries} queries, top_k={args.top_k}")
+    print(f"IVF build (nlist={args.nlist}): {build_seconds:.2f}s\n")
+    print(f"{'index':<16}{'recall@k':>10}{'mean ms':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    print(f"{'flat':<16}{1.0:>10.3f}{exact_latency.mean():>10.3f}"
+          f"{np.percentile(exact_latency, 50):>10.3f}{np.percentile(exact_latency, 99):>10.3f}")
+    
+    for nprobe in args.nprobe:
+        found, latency = timed_search(ivf_db, queries, args.top_k, nprobe=nprobe)
+        recall = np.mean([len(f & t) / len(t) for f, t in zip(found, truth)])
+        print(f"{f'ivf nprobe={nprobe}':<16}{recall:>10.3f}{latency.mean():>10.3f}"
+              f"{np.percentile(latency, 50):>10.3f}{np.percentile(latency, 99):>10.3f}")
+
+if __name__ == "__main__":
+    main()
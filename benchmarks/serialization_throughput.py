@@ -0,0 +1,84 @@
+"""Serialization throughput of resource payloads: json.dumps(indent=2) vs. shared/serialization.py.
+
+Builds representative weather, forecast, news and repository payloads and
+encodes each one repeatedly, first the way the resources used to (nested
+dicts through json.dumps with indent=2), then as typed structs through every
+backend available in shared/serialization.py with compact output.
+
+    python benchmarks/serialization_throughput.py --iterations 20000
+"""
+import argparse
+import dataclasses
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # repository root, for the shared package
+from shared import serialization
+from shared.serialization import (
+    Article, CurrentWeather, Forecast, ForecastDay, ForecastEntry, NewsResult, Repository, RepositoryList,
+    Temperature, Wind
+)
+
+def make_payloads():
+    """One struct payload per resource shape, sized like a typical upstream answer."""
+    weather = CurrentWeather(
+        city="London", country="GB", temperature=Temperature(11.3, 10.1, 9.8, 12.9), humidity=81,
+        wind=Wind(4.6, 250), conditions=["light rain", "mist"], timestamp="2024-05-01T12:00:00"
+    )
+    forecast = Forecast(city="London", country="GB", days=[
+        ForecastDay(date=f"2024-05-0{day + 1}", forecasts=[
+            ForecastEntry(time=f"{hour * 3:02d}:00:00", temperature=10.0 + hour, conditions=["clouds"],
+                          humidity=70 + hour, wind_speed=3.5)
+            for hour in range(8)
+        ])
+        for day in range(5)
+    ])
+    news = NewsResult(topic="technology", count=10, articles=[
+        Article(title=f"Headline number {i} about technology", source="Example News", author="A. Writer",
+                published="2024-05-01T08:00:00Z", url=f"https://news.example.com/articles/{i}",
+                description="A short summary of the article that is a sentence or two long. " * 2)
+        for i in range(10)
+    ])
+    repos = RepositoryList(username="octocat", repository_count=30, repositories=[
+        Repository(name=f"project-{i}", description="An example repository", url=f"https://github.com/octocat/project-{i}",
+                   stars=i * 17, forks=i * 3, language="Python", created_at="2020-01-01T00:00:00Z",
+                   updated_at="2024-04-30T00:00:00Z")
+        for i in range(30)
+    ])
+    return {"weather": weather, "forecast": forecast, "news": news, "repos": repos}
+
+def measure(encode, payload, iterations):
+    """Return (encodes per second, encoded size in bytes)."""
+    size = len(encode(payload).encode())
+    start = time.perf_counter()
+    for _ in range(iterations):
+        encode(payload)
+    return iterations / (time.perf_counter() - start), size
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    payloads = make_payloads()
+
+    print(f"Backends available: {', '.join(serialization.BACKENDS)} (default: {serialization.BACKEND})\n")
+    print(f"{'payload':<10}{'encoder':<24}{'encodes/s':>12}{'MB/s':>9}{'bytes':>9}{'speedup':>9}")
+    for payload_name, payload in payloads.items():
+        # The resources used to build plain dicts and indent them, so convert once outside the timed loop
+        as_dict = dataclasses.asdict(payload)
+        results = [("json indent=2 (dicts)", *measure(lambda _: json.dumps(as_dict, indent=2), payload, args.iterations))]
+        for backend in serialization.BACKENDS:
+            encode = lambda struct, backend=backend: serialization.dumps(struct, backend=backend)
+            results.append((f"{backend} compact", *measure(encode, payload, args.iterations)))
+
+        baseline = results[0][1]
+        for encoder_name, rate, size in results:
+            print(f"{payload_name:<10}{encoder_name:<24}{rate:>12,.0f}{rate * size / 1e6:>9.1f}{size:>9}"
+                  f"{rate / baseline:>8.1f}x")
+        print()
+
+if __name__ == "__main__":
+    main()
@@ -1,66 +1,502 @@
+import asyncio
+import functools
 import httpx
-import json
+import inspect
+import sys
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
 from datetime import datetime
+from pathlib import Path
 from mcp.server.fastmcp import FastMCP
 
-# Initialize MCP server
-mcp = FastMCP("api-resources")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # repository root, for the shared package
+from shared.http_cache import ConditionalCache
+from shared.rate_limit import RateLimitScheduler
+from shared import serialization
+from shared.serialization import (
+    Article, CurrentWeather, Forecast, ForecastDay, ForecastEntry, NewsResult, Repository, RepositoryList,
+    Temperature, Wind
+)
 
 # API keys (in a real application, use environment variables or secure storage)
 WEATHER_API_KEY = "your_weather_api_key"
 NEWS_API_KEY = "your_news_api_key"
 
+# Upstream API base URLs
+WEATHER_API_URL = "https://api.openweathermap.org/data/2.5"
+NEWS_API_URL = "https://newsapi.org/v2"
+GITHUB_API_URL = "https://api.github.com"
+REQUEST_TIMEOUT = 10.0
+
+# Upstream requests in flight at once for a multi-city weather read
+BATCH_CONCURRENCY = 10
+
+# Per-upstream failure handling: the circuit opens after failure_threshold consecutive
+# failures and lets a probe through after reset_timeout seconds. With hedge_percentile set,
+# a duplicate request is sent once the first has run longer than that latency percentile
+# (GitHub is not hedged, since duplicates would spend rate limit).
+UPSTREAMS = {
+    "openweathermap": {"failure_threshold": 5, "reset_timeout": 30.0, "hedge_percentile": 95},
+    "newsapi": {"failure_threshold": 5, "reset_timeout": 30.0, "hedge_percentile": 95},
+    "github": {"failure_threshold": 5, "reset_timeout": 60.0, "hedge_percentile": None}
+}
+
+# Shared client, so upstream calls (and hedged duplicates) reuse pooled connections
+http_client = None
+
+def get_http_client():
+    global http_client
+    if http_client is None or http_client.is_closed:
+        http_client = httpx.AsyncClient(
+            timeout=REQUEST_TIMEOUT,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20)
+        )
+    return http_client
+
+active_sessions = 0
+
+@asynccontextmanager
+async def lifespan(server):
+    """Close the shared HTTP client's connections when the last session ends.
+    
+    FastMCP enters the lifespan once per session, and the HTTP transports run
+    one session per client, so the client is shared by every open session.
+    """
+    global http_client, active_sessions
+    active_sessions += 1
+    try:
+        yield
+    finally:
+        active_sessions -= 1
+        if not active_sessions and http_client is not None:
+            client, http_client = http_client, None
+            await client.aclose()
+
+# Initialize MCP server
+mcp = FastMCP("api-resources", lifespan=lifespan)
+
+# Per-URI cache control: reads within max_age seconds are served from the cache, and for
+# stale_while_revalidate seconds after that the stale copy is served while a background
+# refresh runs. Weather and news change on a scale of minutes, not per request.
+CACHE_CONTROL = {
+    "api://weather/current/{city}": {"max_age": 300, "stale_while_revalidate": 600},
+    "api://weather/forecast/{city}/{days}": {"max_age": 1800, "stale_while_revalidate": 3600},
+    "api://news/{topic}/{count}": {"max_age": 120, "stale_while_revalidate": 600}
+}
+CACHE_MAX_ENTRIES = 1024
+CACHE_MAX_BYTES = 8 * 1024 * 1024
+
+# GitHub responses are revalidated with ETags, so unchanged repository lists cost a 304 instead of a full payload
+github_cache = ConditionalCache(max_entries=256, max_bytes=16 * 1024 * 1024)
+
+# GitHub requests queue here and are paced by the X-RateLimit-* headers instead of failing with 403/429
+github_scheduler = RateLimitScheduler(rate=10.0, burst=10)
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit breaker is open."""
+
+class Upstream:
+    """Circuit breaker and request hedging for one upstream API.
+    
+    Closed: calls go through, and failure_threshold consecutive failures
+    (transport errors, timeouts, 429 or 5xx responses) open the circuit.
+    Open: calls fail immediately with CircuitOpenError until reset_timeout
+    has passed. Half-open: a single probe call is let through; success closes
+    the circuit and failure opens it again.
+    
+    When hedge_percentile is set and enough latencies have been observed, a
+    call still running after that percentile of recent latencies gets a
+    duplicate request, and whichever answers first wins. At most hedge_budget
+    of calls are hedged, so a degraded upstream is not hit with double load.
+    """
+    
+    def __init__(self, name, failure_threshold=5, reset_timeout=30.0, hedge_percentile=None,
+                 hedge_budget=0.1, min_samples=20, window=200):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.hedge_percentile = hedge_percentile
+        self.hedge_budget = hedge_budget
+        self.min_samples = min_samples
+        self.latencies = deque(maxlen=window)
+        
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        
+        self.calls = 0
+        self.failures = 0
+        self.rejected = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+    
+    async def call(self, send):
+        """Await send() (a coroutine function returning a response) under this upstream's policy."""
+        self.before_call()
+        probe = self.state == "half_open"
+        try:
+            response = await self.hedged_send(send)
+        except asyncio.CancelledError:
+            if probe:
+                self.probe_in_flight = False
+            raise
+        except Exception:
+            self.record(success=False)
+            raise
+        
+        self.record(success=response.status_code != 429 and response.status_code < 500)
+        return response
+    
+    def before_call(self):
+        if self.state == "open":
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                self.rejected += 1
+                retry_in = self.reset_timeout - (time.monotonic() - self.opened_at)
+                raise CircuitOpenError(f"{self.name} is unavailable (circuit open, retrying in {retry_in:.0f}s)")
+            self.state = "half_open"
+        
+        if self.state == "half_open":
+            if self.probe_in_flight:
+                self.rejected += 1
+                raise CircuitOpenError(f"{self.name} is unavailable (circuit half-open, probe in progress)")
+            self.probe_in_flight = True
+        
+        self.calls += 1
+    
+    def record(self, success):
+        self.probe_in_flight = False
+        if success:
+            self.consecutive_failures = 0
+            self.state = "closed"
+            return
+        
+        self.failures += 1
+        self.consecutive_failures += 1
+        if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+            self.state = "open"
+            self.opened_at = time.monotonic()
+    
+    def hedge_delay(self):
+        if self.hedge_percentile is None or len(self.latencies) < self.min_samples:
+            return None
+        if self.hedged >= self.hedge_budget * self.calls:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * self.hedge_percentile / 100))]
+    
+    async def timed_send(self, send):
+        start = time.monotonic()
+        try:
+            return await send()
+        finally:
+            # Cancelled losers are recorded too, as lower bounds, so the tail stays visible
+            self.latencies.append(time.monotonic() - start)
+    
+    async def hedged_send(self, send):
+        primary = asyncio.ensure_future(self.timed_send(send))
+        pending = {primary}
+        try:
+            delay = self.hedge_delay()
+            if delay is None:
+                return await primary
+            
+            done, _ = await asyncio.wait(pending, timeout=delay)
+            if not done:
+                self.hedged += 1
+                pending.add(asyncio.ensure_future(self.timed_send(send)))
+            
+            # First successful answer wins; fail only if every attempt failed
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+    
+    def stats(self):
+        ordered = sorted(self.latencies)
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "calls": self.calls,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "hedge_delay_seconds": self.hedge_delay(),
+            "p50_seconds": ordered[len(ordered) // 2] if ordered else None,
+            "p99_seconds": ordered[int(len(ordered) * 0.99)] if ordered else None
+        }
+
+upstreams = {name: Upstream(name, **config) for name, config in UPSTREAMS.items()}
+
+class SingleFlight:
+    """Shares one in-flight call between concurrent callers asking for the same key.
+    
+    The first caller starts the call; anyone arriving before it finishes awaits
+    the same task and gets the same result (or exception). Waiters are shielded
+    from each other, so one cancelled reader does not cancel the fetch for the rest.
+    """
+    
+    def __init__(self):
+        self.calls = {}  # key -> task
+        self.started = 0
+        self.coalesced = 0
+    
+    async def do(self, key, func):
+        task = self.calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self.calls[key] = task
+            self.started += 1
+            task.add_done_callback(lambda done: self.calls.pop(key, None) if self.calls.get(key) is done else None)
+        else:
+            self.coalesced += 1
+        
+        return await asyncio.shield(task)
+    
+    def stats(self):
+        reads = self.started + self.coalesced
+        return {
+            "in_flight": len(self.calls),
+            "upstream_fetches": self.started,
+            "coalesced_reads": self.coalesced,
+            "coalesced_rate": self.coalesced / reads if reads else 0.0
+        }
+
+single_flight = SingleFlight()
+
+class StaleWhileRevalidateCache:
+    """LRU cache of resource payloads with per-entry TTL and stale-while-revalidate.
+    
+    Fresh entries are returned directly. Stale entries still inside their
+    revalidation window are returned immediately while one background task
+    refetches them; if that refresh fails the stale copy keeps being served
+    until the window ends. Error payloads are never stored, and the least
+    recently used entries are evicted beyond max_entries or max_bytes.
+    """
+    
+    def __init__(self, max_entries=1024, max_bytes=8 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # key -> (stored_at, payload)
+        self.size = 0
+        self.refreshing = {}  # key -> background refresh task
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_failures = 0
+        self.evictions = 0
+    
+    @staticmethod
+    def cacheable(payload):
+        # Resources report failures as "Error ..." strings rather than raising
+        return isinstance(payload, str) and not payload.startswith("Error")
+    
+    async def get(self, key, policy, fetch):
+        entry = self.entries.get(key)
+        if entry is not None:
+            age = time.monotonic() - entry[0]
+            if age < policy["max_age"]:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            
+            if age < policy["max_age"] + policy["stale_while_revalidate"]:
+                self.entries.move_to_end(key)
+                self.stale_hits += 1
+                self.revalidate(key, fetch)
+                return entry[1]
+        
+        self.misses += 1
+        payload = await fetch()
+        if self.cacheable(payload):
+            self.put(key, payload)
+        return payload
+    
+    def revalidate(self, key, fetch):
+        if key not in self.refreshing:
+            self.refreshing[key] = asyncio.ensure_future(self.refresh(key, fetch))
+    
+    async def refresh(self, key, fetch):
+        try:
+            payload = await fetch()
+            if self.cacheable(payload):
+                self.put(key, payload)
+                self.refreshes += 1
+            else:
+                self.refresh_failures += 1
+        except Exception:
+            self.refresh_failures += 1
+        finally:
+            del self.refreshing[key]
+    
+    def put(self, key, payload):
+        previous = self.entries.pop(key, None)
+        if previous is not None:
+            self.size -= len(previous[1])
+        
+        self.entries[key] = (time.monotonic(), payload)
+        self.size += len(payload)
+        
+        while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+            _, (_, evicted) = self.entries.popitem(last=False)
+            self.size -= len(evicted)
+            self.evictions += 1
+    
+    def stats(self):
+        reads = self.hits + self.stale_hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "bytes": self.size,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "refresh_failures": self.refresh_failures,
+            "evictions": self.evictions,
+            "hit_rate": (self.hits + self.stale_hits) / reads if reads else 0.0
+        }
+
+resource_cache = StaleWhileRevalidateCache(CACHE_MAX_ENTRIES, CACHE_MAX_BYTES)
+
+def call_key(signature, args, kwargs):
+    """Arguments of a call by parameter name, so f("London") and f(city="London") share a key."""
+    bound = signature.bind(*args, **kwargs)
+    bound.apply_defaults()
+    return tuple(bound.arguments.items())
+
+def cached(uri):
+    """Decorate a resource so reads are served from resource_cache under CACHE_CONTROL[uri]."""
+    policy = CACHE_CONTROL[uri]
+    
+    def decorator(func):
+        signature = inspect.signature(func)
+        
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            key = (uri, call_key(signature, args, kwargs))
+            return await resource_cache.get(key, policy, lambda: func(*args, **kwargs))
+        return wrapper
+    return decorator
+
+def coalesced(func):
+    """Decorate a resource so concurrent reads of the same URI share one upstream fetch."""
+    signature = inspect.signature(func)
+    
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        key = (func.__name__, call_key(signature, args, kwargs))
+        return await single_flight.do(key, lambda: func(*args, **kwargs))
+    return wrapper
+
 @mcp.resource(
     uri="api://weather/current/{city}",
     name="Current Weather",
     description="Get current weather for a city"
 )
+@cached("api://weather/current/{city}")
+@coalesced
 async def current_weather(city):
     """Get current weather for a specified city."""
     try:
         # Connect to OpenWeatherMap API
-        url = f"https://api.openweathermap.org/data/2.5/weather"
+        url = f"{WEATHER_API_URL}/weather"
         params = {
             "q": city,
             "appid": WEATHER_API_KEY,
             "units": "metric"
         }
         
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, params=params, timeout=10.0)
-            response.raise_for_status()
-            data = response.json()
+        response = await upstreams["openweathermap"].call(lambda: get_http_client().get(url, params=params))
+        response.raise_for_status()
+        data = response.json()
         
         # Format the response
-        weather = {
-            "city": data.get("name", city),
-            "country": data.get("sys", {}).get("country", ""),
-            "temperature": {
-                "current": data.get("main", {}).get("temp", 0),
-                "feels_like": data.get("main", {}).get("feels_like", 0),
-                "min": data.get("main", {}).get("temp_min", 0),
-                "max": data.get("main", {}).get("temp_max", 0),
-                "unit": "°C"
-            },
-            "humidity": data.get("main", {}).get("humidity", 0),
-            "wind": {
-                "speed": data.get("wind", {}).get("speed", 0),
-                "direction": data.get("wind", {}).get("deg", 0)
-            },
-            "conditions": [condition.get("description", "") for condition in data.get("weather", [])],
-            "timestamp": datetime.now().isoformat()
-        }
+        main = data.get("main", {})
+        weather = CurrentWeather(
+            city=data.get("name", city),
+            country=data.get("sys", {}).get("country", ""),
+            temperature=Temperature(
+                current=main.get("temp", 0),
+                feels_like=main.get("feels_like", 0),
+                min=main.get("temp_min", 0),
+                max=main.get("temp_max", 0)
+            ),
+            humidity=main.get("humidity", 0),
+            wind=Wind(
+                speed=data.get("wind", {}).get("speed", 0),
+                direction=data.get("wind", {}).get("deg", 0)
+            ),
+            conditions=[condition.get("description", "") for condition in data.get("weather", [])],
+            timestamp=datetime.now().isoformat()
+        )
         
-        return json.dumps(weather, indent=2)
+        return serialization.dumps(weather)
     
     except Exception as e:
         return f"Error fetching weather data: {str(e)}"
 
+@mcp.resource(
+    uri="api://weather/current-batch/{cities}",
+    name="Current Weather (Multiple Cities)",
+    description="Get current weather for a comma-separated list of cities in one read"
+)
+async def current_weather_batch(cities):
+    """Get current weather for several cities, e.g. "London,Paris,Tokyo"."""
+    # Deduplicate case-insensitively, keeping the first spelling and the caller's order
+    unique = {}
+    for city in cities.split(","):
+        city = city.strip()
+        if city and city.lower() not in unique:
+            unique[city.lower()] = city
+    
+    # Fan out through the single-city resource, so every city shares its cache, request
+    # coalescing, circuit breaker and pooled connections. (OpenWeatherMap's group endpoint
+    # needs numeric city IDs, so names are fetched individually.)
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+    
+    async def fetch(city):
+        async with semaphore:
+            return await current_weather(city=city)
+    
+    payloads = await asyncio.gather(*(fetch(city) for city in unique.values()))
+    
+    weather = {}
+    errors = {}
+    for city, payload in zip(unique.values(), payloads):
+        if payload.startswith("Error"):
+            errors[city] = payload
+        else:
+            weather[city] = serialization.loads(payload)
+    
+    result = {
+        "count": len(weather),
+        "weather": weather,
+        "errors": errors
+    }
+    
+    return serialization.dumps(result)
+
 @mcp.resource(
     uri="api://weather/forecast/{city}/{days}",
     name="Weather Forecast",
     description="Get weather forecast for a city"
 )
+@cached("api://weather/forecast/{city}/{days}")
+@coalesced
 async def weather_forecast(city, days="5"):
     """Get weather forecast for a specified city."""
     try:
@@ -70,7 +506,7 @@ async def weather_forecast(city, days="5"):
             days_int = 7  # Limit to 7 days
         
         # Connect to OpenWeatherMap API
-        url = f"https://api.openweathermap.org/data/2.5/forecast"
+        url = f"{WEATHER_API_URL}/forecast"
         params = {
             "q": city,
             "appid": WEATHER_API_KEY,
@@ -78,17 +514,16 @@ async def weather_forecast(city, days="5"):
             "cnt": days_int * 8  # 8 forecasts per day
         }
         
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, params=params, timeout=10.0)
-            response.raise_for_status()
-            data = response.json()
+        response = await upstreams["openweathermap"].call(lambda: get_http_client().get(url, params=params))
+        response.raise_for_status()
+        data = response.json()
         
         # Format the response
-        forecast = {
-            "city": data.get("city", {}).get("name", city),
-            "country": data.get("city", {}).get("country", ""),
-            "days": []
-        }
+        forecast = Forecast(
+            city=data.get("city", {}).get("name", city),
+            country=data.get("city", {}).get("country", ""),
+            days=[]
+        )
         
         # Group by day
         forecasts_by_day = {}
@@ -97,22 +532,19 @@ async def weather_forecast(city, days="5"):
             if date not in forecasts_by_day:
                 forecasts_by_day[date] = []
             
-            forecasts_by_day[date].append({
-                "time": item.get("dt_txt", "").split(" ")[1],
-                "temperature": item.get("main", {}).get("temp", 0),
-                "conditions": [w.get("description", "") for w in item.get("weather", [])],
-                "humidity": item.get("main", {}).get("humidity", 0),
-                "wind_speed": item.get("wind", {}).get("speed", 0)
-            })
+            forecasts_by_day[date].append(ForecastEntry(
+                time=item.get("dt_txt", "").split(" ")[1],
+                temperature=item.get("main", {}).get("temp", 0),
+                conditions=[w.get("description", "") for w in item.get("weather", [])],
+                humidity=item.get("main", {}).get("humidity", 0),
+                wind_speed=item.get("wind", {}).get("speed", 0)
+            ))
         
         # Add days to forecast
         for date, items in forecasts_by_day.items():
-            forecast["days"].append({
-                "date": date,
-                "forecasts": items
-            })
+            forecast.days.append(ForecastDay(date=date, forecasts=items))
         
-        return json.dumps(forecast, indent=2)
+        return serialization.dumps(forecast)
     
     except Exception as e:
         return f"Error fetching forecast data: {str(e)}"
@@ -122,6 +554,8 @@ async def weather_forecast(city, days="5"):
     name="News Articles",
     description="Get news articles by topic"
 )
+@cached("api://news/{topic}/{count}")
+@coalesced
 async def news_articles(topic, count="5"):
     """Get news articles by topic."""
     try:
@@ -131,7 +565,7 @@ async def news_articles(topic, count="5"):
             count_int = 10  # Limit to 10 articles
         
         # Connect to News API
-        url = "https://newsapi.org/v2/everything"
+        url = f"{NEWS_API_URL}/everything"
         params = {
             "q": topic,
             "apiKey": NEWS_API_KEY,
@@ -140,30 +574,25 @@ async def news_articles(topic, count="5"):
             "sortBy": "publishedAt"
         }
         
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, params=params, timeout=10.0)
-            response.raise_for_status()
-            data = response.json()
+        response = await upstreams["newsapi"].call(lambda: get_http_client().get(url, params=params))
+        response.raise_for_status()
+        data = response.json()
         
         # Format the response
         articles = []
         for article in data.get("articles", []):
-            articles.append({
-                "title": article.get("title", ""),
-                "source": article.get("source", {}).get("name", ""),
-                "author": article.get("author", ""),
-                "published": article.get("publishedAt", ""),
-                "url": article.get("url", ""),
-                "description": article.get("description", "")
-            })
-        
-        result = {
-            "topic": topic,
-            "count": len(articles),
-            "articles": articles
-        }
+            articles.append(Article(
+                title=article.get("title", ""),
+                source=article.get("source", {}).get("name", ""),
+                author=article.get("author", ""),
+                published=article.get("publishedAt", ""),
+                url=article.get("url", ""),
+                description=article.get("description", "")
+            ))
         
-        return json.dumps(result, indent=2)
+        result = NewsResult(topic=topic, count=len(articles), articles=articles)
+        
+        return serialization.dumps(result)
     
     except Exception as e:
         return f"Error fetching news data: {str(e)}"
@@ -173,46 +602,91 @@ async def news_articles(topic, count="5"):
     name="GitHub Repositories",
     description="Get GitHub repositories for a user"
 )
+@coalesced
 async def github_repos(username):
     """Get GitHub repositories for a specified user."""
     try:
         # Connect to GitHub API
-        url = f"https://api.github.com/users/{username}/repos"
+        url = f"{GITHUB_API_URL}/users/{username}/repos"
         headers = {
             "Accept": "application/vnd.github.v3+json",
             "User-Agent": "MCP-Server-Example"
 #Authentication:You would need to authenticate your request using an  access token if you are interacting with private repositories or exceeding rate limits. 
         }
         
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, headers=headers, timeout=10.0)
-            response.raise_for_status()
-            data = response.json()
+        # Pacing happens before the circuit breaker, so waiting for (or failing to get) a
+        # rate-limit token is not counted as an upstream failure
+        response = await github_scheduler.request(
+            lambda: upstreams["github"].call(lambda: github_cache.get(get_http_client(), url, headers=headers))
+        )
+        response.raise_for_status()
+        data = response.json()
         
         # Format the response
         repos = []
         for repo in data:
-            repos.append({
-                "name": repo.get("name", ""),
-                "description": repo.get("description", ""),
-                "url": repo.get("html_url", ""),
-                "stars": repo.get("stargazers_count", 0),
-                "forks": repo.get("forks_count", 0),
-                "language": repo.get("language", ""),
-                "created_at": repo.get("created_at", ""),
-                "updated_at": repo.get("updated_at", "")
-            })
-        
-        result = {
-            "username": username,
-            "repository_count": len(repos),
-            "repositories": repos
-        }
+            repos.append(Repository(
+                name=repo.get("name", ""),
+                description=repo.get("description", ""),
+                url=repo.get("html_url", ""),
+                stars=repo.get("stargazers_count", 0),
+                forks=repo.get("forks_count", 0),
+                language=repo.get("language", ""),
+                created_at=repo.get("created_at", ""),
+                updated_at=repo.get("updated_at", "")
+            ))
+        
+        result = RepositoryList(username=username, repository_count=len(repos), repositories=repos)
         
-        return json.dumps(result, indent=2)
+        return serialization.dumps(result)
     
     except Exception as e:
         return f"Error fetching GitHub data: {str(e)}"
 
+@mcp.resource(
+    uri="api://github/cache-stats",
+    name="GitHub Cache Statistics",
+    description="Hit rate and size of the GitHub conditional-request cache"
+)
+async def github_cache_stats():
+    """Get statistics for the GitHub response cache."""
+    return serialization.dumps(github_cache.stats())
+
+@mcp.resource(
+    uri="api://github/rate-limit",
+    name="GitHub Rate Limit",
+    description="Remaining GitHub request budget and scheduler queue statistics"
+)
+async def github_rate_limit():
+    """Get the GitHub rate-limit scheduler state."""
+    return serialization.dumps(github_scheduler.stats())
+
+@mcp.resource(
+    uri="api://stats/single-flight",
+    name="Request Coalescing Statistics",
+    description="How many resource reads shared an in-flight upstream fetch"
+)
+async def single_flight_stats():
+    """Get request coalescing statistics."""
+    return serialization.dumps(single_flight.stats())
+
+@mcp.resource(
+    uri="api://stats/cache",
+    name="Resource Cache Statistics",
+    description="Hit rate and size of the weather and news resource cache"
+)
+async def resource_cache_stats():
+    """Get resource cache statistics."""
+    return serialization.dumps(resource_cache.stats())
+
+@mcp.resource(
+    uri="api://stats/upstreams",
+    name="Upstream Health",
+    description="Circuit breaker state, hedging and latency for each upstream API"
+)
+async def upstream_stats():
+    """Get circuit breaker and hedging statistics per upstream."""
+    return serialization.dumps({name: upstream.stats() for name, upstream in upstreams.items()})
+
 if __name__ == "__main__":
     mcp.run(transport='stdio')
@@ -1,18 +1,363 @@
+import asyncio
+import queue
 import sqlite3
-import json
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, closing, contextmanager
+from pathlib import Path
+from urllib.parse import parse_qs, urlencode
 from mcp.server.fastmcp import FastMCP
 
-# Initialize MCP server
-mcp = FastMCP("database-resources")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # repository root, for the shared package
+from shared import serialization
 
-# Initialize database - In real applications, use connection pooling
 DB_PATH = "example.db"
 
+# Read connection pool settings
+DB_POOL_SIZE = 8                    # Connections kept open for readers
+DB_CACHE_SIZE_KB = 16 * 1024        # Page cache per connection
+DB_MMAP_SIZE = 256 * 1024 * 1024    # Bytes of the database file memory-mapped per connection
+DB_STATEMENT_CACHE_SIZE = 128       # Prepared statements kept per connection
+DB_READER_THREADS = 4               # Queries running at once (at most DB_POOL_SIZE)
+
+# Table reads
+DB_FETCH_BATCH = 500                # Rows fetched and encoded at a time
+DB_PAGE_SIZE = 100                  # Rows per page when paginating without an explicit limit
+DB_MAX_PAGE_SIZE = 10000
+
+# Query string of db://table: reserved parameters, and filter operators (column.op=value) mapped to SQL
+TABLE_QUERY_PARAMS = {"fields", "order", "after", "after_value", "after_null", "limit"}
+FILTER_OPERATORS = {
+    "eq": "=",
+    "ne": "!=",
+    "lt": "<",
+    "le": "<=",
+    "gt": ">",
+    "ge": ">=",
+    "like": "LIKE",
+    "in": "IN"
+}
+
+# Batch record reads
+DB_MAX_BATCH_IDS = 10000            # IDs accepted per batch read
+DB_IN_LIST_MAX = 100                # Larger batches are passed as one JSON array instead of bound one by one
+
+# Result cache for table and record reads
+DB_RESULT_CACHE_MAX_ENTRIES = 1024
+DB_RESULT_CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+class ConnectionPool:
+    """Pool of read-only SQLite connections, opened lazily up to `size`.
+    
+    Each connection is tuned once when opened (memory-mapped I/O, a larger
+    page cache, synchronous=NORMAL, which is safe under WAL) and keeps its own
+    cache of prepared statements, so reusing the same parameterized SQL
+    skips re-parsing. Connections may be used from any thread, one at a time.
+    """
+    
+    def __init__(self, path, size=8):
+        self.path = path
+        self.size = size
+        self.idle = queue.LifoQueue()  # most recently used first, its pages are warmest
+        self.created = 0
+        self.lock = threading.Lock()
+    
+    def open(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, cached_statements=DB_STATEMENT_CACHE_SIZE)
+        conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA mmap_size = {DB_MMAP_SIZE}")
+        conn.execute(f"PRAGMA cache_size = -{DB_CACHE_SIZE_KB}")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute("PRAGMA query_only = ON")
+        return conn
+    
+    @contextmanager
+    def connection(self):
+        try:
+            conn = self.idle.get_nowait()
+        except queue.Empty:
+            with self.lock:
+                can_open = self.created < self.size
+                if can_open:
+                    self.created += 1
+            if can_open:
+                try:
+                    conn = self.open()
+                except Exception:
+                    with self.lock:
+                        self.created -= 1
+                    raise
+            else:
+                conn = self.idle.get()
+        
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self.idle.put(conn)
+    
+    def close(self):
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except queue.Empty:
+                break
+            with self.lock:
+                self.created -= 1
+
+pool = ConnectionPool(DB_PATH, DB_POOL_SIZE)
+
+class ReaderPool:
+    """Runs blocking SQLite reads on dedicated threads so a slow query cannot stall the event loop.
+    
+    Reads beyond `threads` wait in the executor's queue; queue depth, wait
+    time and run time are tracked for the stats resource. The executor is
+    created on first use, and again after a shutdown.
+    """
+    
+    def __init__(self, threads=4):
+        self.threads = threads
+        self.executor = None
+        self.lock = threading.Lock()
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.max_queue_depth = 0
+        self.wait_seconds = 0.0
+        self.run_seconds = 0.0
+    
+    async def run(self, func, *args):
+        """Run func(*args) on a reader thread and await its result."""
+        submitted = time.monotonic()
+        with self.lock:
+            self.queued += 1
+            self.max_queue_depth = max(self.max_queue_depth, self.queued)
+        
+        def task():
+            started = time.monotonic()
+            with self.lock:
+                self.queued -= 1
+                self.running += 1
+                self.wait_seconds += started - submitted
+            failed = True
+            try:
+                result = func(*args)
+                failed = False
+                return result
+            finally:
+                with self.lock:
+                    self.running -= 1
+                    self.completed += 1
+                    self.failed += failed
+                    self.run_seconds += time.monotonic() - started
+        
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="db-reader")
+            future = self.executor.submit(task)
+        return await asyncio.wrap_future(future)
+    
+    def stats(self):
+        with self.lock:
+            return {
+                "threads": self.threads,
+                "queue_depth": self.queued,
+                "running": self.running,
+                "completed": self.completed,
+                "failed": self.failed,
+                "max_queue_depth": self.max_queue_depth,
+                "mean_wait_ms": 1000 * self.wait_seconds / self.completed if self.completed else 0.0,
+                "mean_run_ms": 1000 * self.run_seconds / self.completed if self.completed else 0.0
+            }
+    
+    def shutdown(self):
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+readers = ReaderPool(DB_READER_THREADS)
+
+class SchemaCache:
+    """Process-wide cache of PRAGMA table_info results.
+    
+    SQLite bumps PRAGMA schema_version on every schema change, and reading it
+    only looks at the database header, so each lookup checks it and drops
+    every cached table when it has moved (e.g. after a migration).
+    """
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = None
+        self.tables = {}  # table -> tuple of (cid, name, type, notnull, default_value, pk)
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+    
+    def table_info(self, conn, table):
+        version = conn.execute("PRAGMA schema_version").fetchone()[0]
+        with self.lock:
+            if version != self.version:
+                if self.version is not None:
+                    self.invalidations += 1
+                self.tables.clear()
+                self.version = version
+            info = self.tables.get(table)
+            if info is not None:
+                self.hits += 1
+                return info
+            self.misses += 1
+        
+        info = tuple(tuple(col) for col in conn.execute(f"PRAGMA table_info({table})"))
+        with self.lock:
+            if self.version == version:
+                self.tables[table] = info
+        return info
+    
+    def columns(self, conn, table):
+        return [col[1] for col in self.table_info(conn, table)]
+    
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "schema_version": self.version,
+                "tables": len(self.tables),
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+schema_cache = SchemaCache()
+
+class ResultCache:
+    """Serialized table and record payloads, reused until the database changes.
+    
+    PRAGMA data_version on a connection changes whenever another connection
+    commits, so a dedicated connection that never writes sees every commit,
+    whether made by this process or another one. Each lookup checks it and
+    drops every entry once it has moved. Entries are kept in LRU order and
+    evicted once max_entries or max_bytes (counted in characters) is exceeded.
+    """
+    
+    def __init__(self, path, max_entries=1024, max_bytes=32 * 1024 * 1024):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.watcher = None
+        self.version = None
+        self.entries = OrderedDict()  # key -> payload
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+    
+    def data_version(self):
+        # Called with the lock held; the watcher connection is only used here
+        if self.watcher is None:
+            self.watcher = sqlite3.connect(self.path, check_same_thread=False)
+            self.watcher.execute("PRAGMA query_only = ON")
+        return self.watcher.execute("PRAGMA data_version").fetchone()[0]
+    
+    def get_or_read(self, key, func, *args):
+        """Return the cached payload for key, or call func(*args) and cache what it returns."""
+        with self.lock:
+            version = self.data_version()
+            if version != self.version:
+                if self.version is not None and self.entries:
+                    self.invalidations += 1
+                self.entries.clear()
+                self.size = 0
+                self.version = version
+            payload = self.entries.get(key)
+            if payload is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return payload
+            self.misses += 1
+        
+        payload = func(*args)
+        
+        with self.lock:
+            # A commit during the read means the payload may already be stale
+            if self.version == version and key not in self.entries and len(payload) <= self.max_bytes:
+                self.entries[key] = payload
+                self.size += len(payload)
+                while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+                    _, evicted = self.entries.popitem(last=False)
+                    self.size -= len(evicted)
+                    self.evictions += 1
+        return payload
+    
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "data_version": self.version,
+                "entries": len(self.entries),
+                "max_entries": self.max_entries,
+                "bytes": self.size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "invalidations": self.invalidations,
+                "evictions": self.evictions
+            }
+    
+    def close(self):
+        with self.lock:
+            if self.watcher is not None:
+                self.watcher.close()
+                self.watcher = None
+            # data_version is only comparable on one connection, so a new watcher starts empty
+            self.entries.clear()
+            self.size = 0
+            self.version = None
+
+result_cache = ResultCache(DB_PATH, DB_RESULT_CACHE_MAX_ENTRIES, DB_RESULT_CACHE_MAX_BYTES)
+
+active_sessions = 0
+
+@asynccontextmanager
+async def lifespan(server):
+    """Stop the reader threads and close pooled connections when the last session ends.
+    
+    FastMCP enters the lifespan once per session, and the HTTP transports run
+    one session per client, so teardown waits until none is left. Threads and
+    connections are reopened on the next read.
+    """
+    global active_sessions
+    active_sessions += 1
+    try:
+        yield
+    finally:
+        active_sessions -= 1
+        if not active_sessions:
+            # Waiting for a running query must not block the event loop
+            await asyncio.to_thread(readers.shutdown)
+            pool.close()
+            result_cache.close()
+
+# Initialize MCP server
+mcp = FastMCP("database-resources", lifespan=lifespan)
+
 # Initialize example database with sample data
 def init_database():
     conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
     
+    # WAL lets readers run concurrently with each other and with a writer (persists in the file)
+    cursor.execute("PRAGMA journal_mode = WAL")
+    
     # Create tables
     cursor.execute('''
     CREATE TABLE IF NOT EXISTS customers (
@@ -47,39 +392,206 @@ init_database()
 @mcp.resource(
     uri="db://table/{table}",
     name="Database Table",
-    description="Get all records from a database table"
+    description=(
+        "Get records from a database table. Query string: fields=<col,...>, <col>[.<op>]=<value> filters "
+        "(ops: eq, ne, lt, le, gt, ge, like, in), order=[-]<col>, limit=<n>; follow \"next\" for further pages"
+    )
 )
 async def get_table(table):
-    """Get all records from a database table."""
+    """Get all records from a database table, or a selection of them.
+    
+    db://table/products returns every row as a JSON array. With a query string
+    it returns one page of rows plus a "next" URI for the following page (null
+    on the last page):
+    
+    - fields=name,price returns only those columns
+    - price.gt=10, name=Basic Widget or id.in=1,2,3 filter rows (a column
+      without an operator means eq); values are bound as parameters
+    - order=price or order=-price sorts by a column (default id), ties by id
+    - after=200&limit=100 reads the rows after id 200, 100 at a time; when
+      ordering by another column the position is that column's value plus id
+      (after_value=19.99&after=200, or after_null=1&after=200 for NULL), which
+      the "next" URI fills in
+    
+    Columns are checked against the table schema, and the whole selection runs
+    in SQL, so filters and ordering can use indexes (see the explain_table_query
+    tool).
+    """
+    # The template captures everything after db://table/, including any query string
+    table, _, query = table.partition("?")
+    # Blank values are kept: name= filters on the empty string, and fields= is rejected below
+    params = {key: values[-1] for key, values in parse_qs(query, keep_blank_values=True).items()}
+    
     # Validate table name for security (prevent SQL injection)
     allowed_tables = ["customers", "products"]
     if table not in allowed_tables:
         return f"Access denied: Table '{table}' is not accessible"
     
     try:
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row  # Return rows as dictionaries
+        if not params:
+            return await readers.run(result_cache.get_or_read, ("table", table), read_table, table)
+        
+        try:
+            after = int(params["after"]) if "after" in params else None
+            limit = int(params.get("limit", DB_PAGE_SIZE))
+        except ValueError:
+            return "Invalid parameters: after and limit must be integers"
+        if not 1 <= limit <= DB_MAX_PAGE_SIZE:
+            return f"Invalid parameters: limit must be between 1 and {DB_MAX_PAGE_SIZE}"
+        
+        return await readers.run(
+            result_cache.get_or_read, ("query", table, tuple(sorted(params.items()))),
+            read_table_query, table, params, after, limit
+        )
+    
+    except ValueError as e:
+        return f"Invalid parameters: {str(e)}"
+    except Exception as e:
+        return f"Database error: {str(e)}"
+
+def build_table_query(table, columns, params, after=None, limit=DB_PAGE_SIZE):
+    """Translate db://table query parameters into SQL over whitelisted columns.
+    
+    Returns (sql, arguments, selected fields, filters as (column, op) pairs,
+    order column). Raises ValueError for unknown columns or operators. The
+    statement also selects the order column (unless it is id) and id last,
+    for keyset pagination.
+    """
+    fields = columns
+    if "fields" in params:
+        fields = list(dict.fromkeys(field.strip() for field in params["fields"].split(",") if field.strip()))
+        if not fields:
+            raise ValueError(f"fields must name at least one column. Columns: {', '.join(columns)}")
+        unknown = [field for field in fields if field not in columns]
+        if unknown:
+            raise ValueError(f"unknown fields {', '.join(unknown)}. Columns: {', '.join(columns)}")
+    
+    conditions = []
+    arguments = []
+    filters = []
+    for key, value in params.items():
+        if key in TABLE_QUERY_PARAMS:
+            continue
+        column, _, op = key.partition(".")
+        op = op or "eq"
+        if column not in columns:
+            raise ValueError(f"unknown parameter or column '{column}'. Columns: {', '.join(columns)}")
+        if op not in FILTER_OPERATORS:
+            raise ValueError(f"unknown operator '{op}'. Supported: {', '.join(FILTER_OPERATORS)}")
+        
+        if op == "in":
+            values = value.split(",")
+            conditions.append(f"{column} IN ({','.join('?' * len(values))})")
+            arguments.extend(values)
+        else:
+            conditions.append(f"{column} {FILTER_OPERATORS[op]} ?")
+            arguments.append(value)
+        filters.append((column, op))
+    
+    order = params.get("order", "id")
+    descending = order.startswith("-")
+    order_column = order.lstrip("-")
+    if order_column not in columns:
+        raise ValueError(f"unknown order column '{order_column}'. Columns: {', '.join(columns)}")
+    
+    # Keyset pagination: seek past the last (order column, id) seen instead of using OFFSET
+    comparison = "<" if descending else ">"
+    if after is None:
+        if "after_value" in params or "after_null" in params:
+            raise ValueError("after_value and after_null need after")
+    elif order_column == "id":
+        conditions.append(f"id {comparison} ?")
+        arguments.append(after)
+    elif "after_null" in params:
+        # NULLs sort first ascending and last descending
+        if descending:
+            conditions.append(f"({order_column} IS NULL AND id < ?)")
+        else:
+            conditions.append(f"({order_column} IS NOT NULL OR id > ?)")
+        arguments.append(after)
+    elif "after_value" in params:
+        seek = f"({order_column}, id) {comparison} (?, ?)"
+        conditions.append(f"({seek} OR {order_column} IS NULL)" if descending else seek)
+        arguments.extend([params["after_value"], after])
+    else:
+        raise ValueError(f"after needs after_value (or after_null=1) when ordering by {order_column}")
+    
+    direction = " DESC" if descending else ""
+    order_by = f"id{direction}" if order_column == "id" else f"{order_column}{direction}, id{direction}"
+    
+    keyset = ["id"] if order_column == "id" else [order_column, "id"]
+    sql = f"SELECT {', '.join(fields + keyset)} FROM {table}"
+    if conditions:
+        sql += f" WHERE {' AND '.join(conditions)}"
+    sql += f" ORDER BY {order_by} LIMIT ?"
+    arguments.append(limit)
+    
+    return sql, arguments, fields, filters, order_column
+
+def encode_rows(cursor, columns):
+    """Encode a cursor's remaining rows as a JSON array, DB_FETCH_BATCH rows at a time.
+    
+    Only one batch of row objects is alive at once, so memory tracks the
+    encoded output rather than a list of dicts for the whole table. Returns
+    the JSON text, the row count and the last row.
+    """
+    chunks = ["["]
+    count = 0
+    last_row = None
+    while True:
+        rows = cursor.fetchmany(DB_FETCH_BATCH)
+        if not rows:
+            break
+        if count:
+            chunks.append(",")
+        chunks.append(serialization.dumps([dict(zip(columns, row)) for row in rows])[1:-1])
+        count += len(rows)
+        last_row = rows[-1]
+    chunks.append("]")
+    
+    # A single join, so the output is copied once
+    return "".join(chunks), count, last_row
+
+def read_table(table):
+    with pool.connection() as conn:
         cursor = conn.cursor()
         
-        # Get table schema
-        cursor.execute(f"PRAGMA table_info({table})")
-        columns = [col[1] for col in cursor.fetchall()]
+        # Get column names (cached until the schema changes)
+        columns = schema_cache.columns(conn, table)
         
-        # Get all records
+        # Stream all records through the encoder
         cursor.execute(f"SELECT * FROM {table}")
-        rows = cursor.fetchall()
+        payload, _, _ = encode_rows(cursor, columns)
+    
+    return payload
+
+def read_table_query(table, params, after, limit):
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        
+        # Get column names (cached until the schema changes)
+        columns = schema_cache.columns(conn, table)
         
-        # Convert to list of dictionaries
-        result = []
-        for row in rows:
-            row_dict = {columns[i]: row[i] for i in range(len(columns))}
-            result.append(row_dict)
+        sql, arguments, fields, _, order_column = build_table_query(table, columns, params, after, limit)
         
-        conn.close()
-        return json.dumps(result, indent=2)
+        # Rows end with the keyset columns; encoding stops at the selected fields
+        cursor.execute(sql, arguments)
+        rows, count, last_row = encode_rows(cursor, fields)
     
-    except Exception as e:
-        return f"Database error: {str(e)}"
+    next_uri = None
+    if count == limit:
+        next_params = {
+            key: value for key, value in params.items() if key not in ("after", "after_value", "after_null", "limit")
+        }
+        if order_column != "id":
+            if last_row[-2] is None:
+                next_params["after_null"] = 1
+            else:
+                next_params["after_value"] = last_row[-2]
+        next_params.update(after=last_row[-1], limit=limit)
+        next_uri = f"db://table/{table}?{urlencode(next_params)}"
+    
+    return f'{{"table":{serialization.dumps(table)},"rows":{rows},"next":{serialization.dumps(next_uri)}}}'
 
 @mcp.resource(
     uri="db://record/{table}/{id}",
@@ -94,30 +606,88 @@ async def get_record(table, id):
         return f"Access denied: Table '{table}' is not accessible"
     
     try:
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
+        return await readers.run(result_cache.get_or_read, ("record", table, id), read_record, table, id)
+    
+    except Exception as e:
+        return f"Database error: {str(e)}"
+
+def read_record(table, id):
+    with pool.connection() as conn:
         cursor = conn.cursor()
         
-        # Get table schema
-        cursor.execute(f"PRAGMA table_info({table})")
-        columns = [col[1] for col in cursor.fetchall()]
+        # Get column names (cached until the schema changes)
+        columns = schema_cache.columns(conn, table)
         
         # Get specific record
         cursor.execute(f"SELECT * FROM {table} WHERE id = ?", (id,))
         row = cursor.fetchone()
-        
-        if not row:
-            return f"Record not found: {table}/{id}"
-        
-        # Convert to dictionary
-        result = {columns[i]: row[i] for i in range(len(columns))}
-        
-        conn.close()
-        return json.dumps(result, indent=2)
+    
+    if not row:
+        return f"Record not found: {table}/{id}"
+    
+    # Convert to dictionary
+    result = {columns[i]: row[i] for i in range(len(columns))}
+    
+    return serialization.dumps(result)
+
+@mcp.resource(
+    uri="db://records/{table}/{ids}",
+    name="Database Records (Batch)",
+    description="Get several records from a database table by a comma-separated list of ids in one read"
+)
+async def get_records(table, ids):
+    """Get several records from a database table, e.g. db://records/products/1,2,5.
+    
+    Returns the records keyed by id, plus the ids that did not match a row.
+    """
+    # Validate table name for security
+    allowed_tables = ["customers", "products"]
+    if table not in allowed_tables:
+        return f"Access denied: Table '{table}' is not accessible"
+    
+    # Deduplicate, keeping the caller's order
+    try:
+        unique = list(dict.fromkeys(int(id) for id in ids.split(",") if id.strip()))
+    except ValueError:
+        return "Invalid parameters: ids must be comma-separated integers"
+    if not 1 <= len(unique) <= DB_MAX_BATCH_IDS:
+        return f"Invalid parameters: between 1 and {DB_MAX_BATCH_IDS} ids are accepted"
+    
+    try:
+        return await readers.run(
+            result_cache.get_or_read, ("records", table, tuple(unique)), read_records, table, unique
+        )
     
     except Exception as e:
         return f"Database error: {str(e)}"
 
+def read_records(table, ids):
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        
+        # Get column names (cached until the schema changes)
+        columns = schema_cache.columns(conn, table)
+        
+        # One statement for the whole batch. Short lists bind each id; long ones are bound as a
+        # single JSON array and expanded by json_each, which keeps one cached statement and stays
+        # clear of SQLite's variable limit (the connections are query_only, so no temp table).
+        if len(ids) <= DB_IN_LIST_MAX:
+            cursor.execute(f"SELECT * FROM {table} WHERE id IN ({','.join('?' * len(ids))})", ids)
+        else:
+            cursor.execute(
+                f"SELECT * FROM {table} WHERE id IN (SELECT value FROM json_each(?))", (serialization.dumps(ids),)
+            )
+        found = {row["id"]: dict(zip(columns, row)) for row in cursor}
+    
+    result = {
+        "table": table,
+        "count": len(found),
+        "records": {str(id): found[id] for id in ids if id in found},
+        "missing": [id for id in ids if id not in found]
+    }
+    
+    return serialization.dumps(result)
+
 @mcp.resource(
     uri="db://schema/{table}",
     name="Database Schema",
@@ -131,30 +701,127 @@ async def get_schema(table):
         return f"Access denied: Table '{table}' is not accessible"
     
     try:
-        conn = sqlite3.connect(DB_PATH)
+        return await readers.run(read_schema, table)
+    
+    except Exception as e:
+        return f"Database error: {str(e)}"
+
+def read_schema(table):
+    with pool.connection() as conn:
         cursor = conn.cursor()
         
         # Get table schema
-        cursor.execute(f"PRAGMA table_info({table})")
-        columns = cursor.fetchall()
-        
-        # Format schema information
-        schema = []
-        for col in columns:
-            schema.append({
-                "cid": col[0],
-                "name": col[1],
-                "type": col[2],
-                "notnull": col[3],
-                "default_value": col[4],
-                "pk": col[5]
-            })
-        
-        conn.close()
-        return json.dumps(schema, indent=2)
+        columns = schema_cache.table_info(conn, table)
+    
+    # Format schema information
+    schema = []
+    for col in columns:
+        schema.append({
+            "cid": col[0],
+            "name": col[1],
+            "type": col[2],
+            "notnull": col[3],
+            "default_value": col[4],
+            "pk": col[5]
+        })
+    
+    return serialization.dumps(schema)
+
+@mcp.tool()
+async def explain_table_query(table: str, query: str = "") -> str:
+    """Show how SQLite would run a db://table query and suggest an index when it scans the whole table.
+    
+    Args:
+        table: Table name, e.g. "products"
+        query: db://table query string, e.g. "price.gt=10&order=-price". When empty,
+            an equality filter on every column is checked instead.
+    """
+    allowed_tables = ["customers", "products"]
+    if table not in allowed_tables:
+        return f"Access denied: Table '{table}' is not accessible"
+    
+    try:
+        return await readers.run(advise_indexes, table, query)
     
+    except ValueError as e:
+        return f"Invalid parameters: {str(e)}"
     except Exception as e:
         return f"Database error: {str(e)}"
 
+def advise_indexes(table, query):
+    # A fresh connection: pooled ones keep EXPLAIN statements in their statement cache, and
+    # those are not re-prepared after a schema change, so they would miss a newly created index
+    with closing(pool.open()) as conn:
+        columns = schema_cache.columns(conn, table)
+        
+        if query:
+            queries = [query]
+        else:
+            queries = [urlencode({column: ""}) for column in columns if column != "id"]
+        
+        checks = []
+        for checked in queries:
+            params = {key: values[-1] for key, values in parse_qs(checked, keep_blank_values=True).items()}
+            after = int(params["after"]) if "after" in params else None
+            sql, arguments, _, filters, order_column = build_table_query(
+                table, columns, params, after, int(params.get("limit", DB_PAGE_SIZE))
+            )
+            plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", arguments)]
+            
+            # "SCAN <table>" reads every row (or every index entry); "SEARCH" seeks through an index
+            full_scan = any(step.startswith(f"SCAN {table}") for step in plan)
+            temp_sort = any("TEMP B-TREE" in step for step in plan)
+            
+            # Equality columns first, then one range column, then the sort column
+            suggestion = None
+            if full_scan or temp_sort:
+                index_columns = [column for column, op in filters if op in ("eq", "in")]
+                index_columns += [column for column, op in filters if op not in ("eq", "in")][:1]
+                if order_column != "id":
+                    index_columns.append(order_column)
+                index_columns = [column for column in dict.fromkeys(index_columns) if column != "id"]
+                if index_columns:
+                    suggestion = (
+                        f"CREATE INDEX idx_{table}_{'_'.join(index_columns)} ON {table} ({', '.join(index_columns)})"
+                    )
+            
+            checks.append({
+                "query": checked,
+                "sql": sql,
+                "plan": plan,
+                "full_scan": full_scan,
+                "temp_sort": temp_sort,
+                "suggested_index": suggestion
+            })
+    
+    return serialization.dumps({"table": table, "checks": checks})
+
+@mcp.resource(
+    uri="db://stats/readers",
+    name="Database Reader Statistics",
+    description="Queue depth and timings of the database reader threads"
+)
+async def reader_stats():
+    """Get database reader thread pool statistics."""
+    return serialization.dumps(readers.stats())
+
+@mcp.resource(
+    uri="db://stats/schema-cache",
+    name="Schema Cache Statistics",
+    description="Hit rate of the cached table metadata and the schema version it was read at"
+)
+async def schema_cache_stats():
+    """Get schema cache statistics."""
+    return serialization.dumps(schema_cache.stats())
+
+@mcp.resource(
+    uri="db://stats/result-cache",
+    name="Result Cache Statistics",
+    description="Hit rate, size and invalidations of the cached table and record payloads"
+)
+async def result_cache_stats():
+    """Get result cache statistics."""
+    return serialization.dumps(result_cache.stats())
+
 if __name__ == "__main__":
     mcp.run(transport='stdio')
@@ -0,0 +1,5 @@
+"""Helpers shared by several example servers (HTTP caching, rate limiting, ...).
+
+The examples are standalone scripts, so each one that needs these adds the
+repository root to sys.path before importing from this package.
+"""
@@ -0,0 +1,135 @@
+import json
+import re
+from collections import OrderedDict
+
+LINK_PATTERN = re.compile(r'<([^>]*)>\s*;\s*rel="?([^";]+)"?')
+
+class CachedResponse:
+    """Response returned by ConditionalCache, either fresh from the network or revalidated.
+
+    headers are always those of the latest network response (including 304s),
+    so rate-limit headers stay current even when the body came from the cache.
+    """
+
+    def __init__(self, response, content, from_cache=False, link=None):
+        self.response = response
+        self.status_code = 200 if from_cache else response.status_code
+        self.headers = response.headers
+        self.content = content
+        self.from_cache = from_cache
+        self.link = response.headers.get("link") or link
+        self._data = None
+
+    @property
+    def links(self):
+        """Pagination links from the Link header, as {rel: url}."""
+        return {rel: url for url, rel in LINK_PATTERN.findall(self.link or "")}
+
+    def json(self):
+        # Parsed on first use, once per response
+        if self._data is None:
+            self._data = json.loads(self.content)
+        return self._data
+
+    def raise_for_status(self):
+        if not self.from_cache:
+            self.response.raise_for_status()
+
+class ConditionalCache:
+    """HTTP cache that revalidates entries with ETag/Last-Modified.
+
+    Successful responses carrying a validator are stored as their raw body
+    bytes only, so max_bytes bounds the bodies actually held (plus small
+    per-entry headers); a body served from the cache is parsed again by
+    whoever reads it. Later requests for the same URL send If-None-Match /
+    If-Modified-Since, and a 304 answer (which GitHub does not count against
+    the rate limit) is served from the stored copy. The least recently used
+    entries are evicted once max_entries or max_bytes is exceeded.
+    """
+
+    # Request headers that change the response, and therefore the cache key
+    VARY_HEADERS = ("accept", "authorization")
+
+    def __init__(self, max_entries=256, max_bytes=16 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # key -> {"etag", "last_modified", "link", "content"}
+        self.size = 0
+        self.requests = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes_saved = 0
+
+    def key(self, client, url, params, headers):
+        merged = {**client.headers, **(headers or {})}
+        vary = tuple((name, merged.get(name, "")) for name in self.VARY_HEADERS)
+        return (str(client.base_url.join(url)), tuple(sorted((params or {}).items())), vary)
+
+    async def get(self, client, url, params=None, headers=None):
+        """GET url through client, revalidating any cached copy instead of re-downloading it."""
+        self.requests += 1
+        key = self.key(client, url, params, headers)
+        entry = self.entries.get(key)
+
+        request_headers = dict(headers or {})
+        if entry is not None:
+            if entry["etag"]:
+                request_headers["If-None-Match"] = entry["etag"]
+            if entry["last_modified"]:
+                request_headers["If-Modified-Since"] = entry["last_modified"]
+
+        response = await client.get(url, params=params, headers=request_headers)
+
+        if response.status_code == 304 and entry is not None:
+            # A concurrent put may have evicted or replaced the entry while the request was in flight
+            if self.entries.get(key) is entry:
+                self.entries.move_to_end(key)
+            self.hits += 1
+            self.bytes_saved += len(entry["content"])
+            return CachedResponse(response, entry["content"], from_cache=True, link=entry["link"])
+
+        self.misses += 1
+        result = CachedResponse(response, response.content)
+        if response.status_code == 200:
+            self.put(key, response, result)
+        return result
+
+    def put(self, key, response, result):
+        etag = response.headers.get("etag")
+        last_modified = response.headers.get("last-modified")
+        self.discard(key)
+        if not (etag or last_modified) or len(result.content) > self.max_bytes:
+            return
+
+        self.entries[key] = {
+            "etag": etag,
+            "last_modified": last_modified,
+            "link": result.link,
+            "content": result.content
+        }
+        self.size += len(result.content)
+
+        while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= len(evicted["content"])
+            self.evictions += 1
+
+    def discard(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry["content"])
+
+    def stats(self):
+        return {
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "requests": self.requests,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "bytes_saved": self.bytes_saved,
+            "hit_rate": self.hits / self.requests if self.requests else 0.0
+        }
@@ -0,0 +1,211 @@
+import asyncio
+import heapq
+import itertools
+import math
+import time
+
+# Lower values are served first
+PRIORITIES = {"interactive": 0, "bulk": 1}
+
+class RateLimitExceeded(Exception):
+    """A request would have to wait longer than the scheduler's max_wait to be sent."""
+
+    def __init__(self, retry_in):
+        super().__init__(f"Rate limit exceeded. Try again in {retry_in:.0f} seconds.")
+        self.retry_in = retry_in
+
+class RateLimitScheduler:
+    """Token-bucket scheduler that paces requests to a rate-limited API such as GitHub.
+
+    Callers queue for a token by priority, so interactive calls overtake queued
+    bulk work. Tokens refill at `rate` per second up to `burst`; once a response
+    reports X-RateLimit-Remaining/Reset, the refill rate is also capped so the
+    remaining budget is spread over the rest of the window, and bulk calls stop
+    while only the `reserve` share of the limit is left. Throttled responses
+    (403/429 with an exhausted limit or Retry-After) pause the queue and are
+    retried when the wait is short enough. No caller waits longer than
+    `max_wait` for a token: it fails with RateLimitExceeded instead.
+    """
+
+    def __init__(self, rate=10.0, burst=10, reserve=0.1, max_retries=2, max_wait=60.0, reset_margin=1.0):
+        self.rate = rate
+        self.burst = burst
+        self.reserve = reserve
+        self.max_retries = max_retries
+        self.max_wait = max_wait
+        self.reset_margin = reset_margin  # reset times have one-second resolution and clocks drift
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+        # Server-reported state (reset times are epoch seconds)
+        self.limit = None
+        self.remaining = None
+        self.reset_at = None
+        self.blocked_until = 0.0
+
+        self.waiters = []  # heap of (priority, sequence, future)
+        self.sequence = itertools.count()
+        self.dispatcher = None
+        self.wakeup = None
+
+        self.granted = {name: 0 for name in PRIORITIES}
+        self.throttled = 0
+        self.retries = 0
+        self.wait_seconds = 0.0
+
+    async def request(self, send, priority="interactive"):
+        """Await send() once a token is available, retrying throttled responses.
+
+        send is a coroutine function returning a response with status_code and headers.
+        Raises RateLimitExceeded when no token can be granted within max_wait.
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"Invalid priority. Must be one of: {', '.join(PRIORITIES)}")
+
+        for attempt in range(self.max_retries + 1):
+            await self.acquire(priority)
+            response = await send()
+            self.observe(response.headers)
+
+            if not self.is_throttled(response):
+                return response
+
+            self.throttled += 1
+            wait = self.throttle(response)
+            if attempt == self.max_retries or wait > self.max_wait:
+                return response
+            self.retries += 1
+
+        return response
+
+    async def acquire(self, priority="interactive"):
+        # Fail fast when the budget is known to be out of reach (e.g. bulk work held back until reset)
+        wait = self.delay(PRIORITIES[priority])
+        if wait > self.max_wait:
+            raise RateLimitExceeded(wait)
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        heapq.heappush(self.waiters, (PRIORITIES[priority], next(self.sequence), future))
+
+        if self.dispatcher is None:
+            self.wakeup = asyncio.Event()
+            self.dispatcher = loop.create_task(self._dispatch())
+        else:
+            self.wakeup.set()  # a higher-priority caller may be able to go before the current sleep ends
+
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(future, self.max_wait)  # cancels the future, so the dispatcher skips it
+        except asyncio.TimeoutError:
+            self.wakeup.set()  # let the dispatcher drop the cancelled entry
+            raise RateLimitExceeded(max(self.delay(PRIORITIES[priority]), self.retry_in())) from None
+        self.wait_seconds += time.monotonic() - start
+        self.granted[priority] += 1
+
+    async def _dispatch(self):
+        try:
+            while self.waiters:
+                priority, _, future = self.waiters[0]
+                if future.cancelled():
+                    heapq.heappop(self.waiters)
+                    continue
+
+                delay = self.delay(priority)
+                if delay > 0:
+                    self.wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self.wakeup.wait(), delay)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+
+                heapq.heappop(self.waiters)
+                self.tokens -= 1
+                if self.remaining is not None:
+                    self.remaining -= 1
+                future.set_result(None)
+        finally:
+            self.dispatcher = None
+
+    def delay(self, priority):
+        """Seconds until a caller of this priority may send."""
+        now = time.time()
+        if now < self.blocked_until:
+            return self.blocked_until - now
+
+        if self.reset_at is not None and now >= self.reset_at + self.reset_margin:
+            # New window: the next response reports the fresh budget
+            self.remaining = None
+            self.reset_at = None
+
+        if self.remaining is not None:
+            floor = math.ceil((self.limit or 0) * self.reserve) if priority > PRIORITIES["interactive"] else 0
+            if self.remaining <= floor:
+                return self.reset_at + self.reset_margin - now
+
+        rate = self.current_rate()
+        elapsed = time.monotonic() - self.updated
+        self.tokens = min(self.burst, self.tokens + elapsed * rate)
+        self.updated = time.monotonic()
+
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / rate
+
+    def current_rate(self):
+        if self.remaining is None or self.reset_at is None:
+            return self.rate
+        window = max(self.reset_at - time.time(), 1.0)
+        return max(min(self.rate, self.remaining / window), 1e-3)
+
+    def observe(self, headers):
+        """Update the budget from X-RateLimit-* response headers."""
+        remaining = headers.get("x-ratelimit-remaining")
+        reset = headers.get("x-ratelimit-reset")
+        if remaining is None or reset is None:
+            return
+
+        remaining, reset = int(remaining), float(reset)
+        if headers.get("x-ratelimit-limit") is not None:
+            self.limit = int(headers["x-ratelimit-limit"])
+
+        if self.reset_at is None or reset > self.reset_at:
+            self.remaining = remaining
+            self.reset_at = reset
+        else:
+            # Responses to concurrent requests can arrive out of order; keep the lowest count
+            self.remaining = min(self.remaining, remaining)
+
+    @staticmethod
+    def is_throttled(response):
+        if response.status_code not in (403, 429):
+            return False
+        return "retry-after" in response.headers or response.headers.get("x-ratelimit-remaining") == "0"
+
+    def throttle(self, response):
+        """Pause the queue for a throttled response and return the wait in seconds."""
+        retry_after = response.headers.get("retry-after")
+        if retry_after is not None:
+            self.blocked_until = max(self.blocked_until, time.time() + float(retry_after))
+        elif self.reset_at is not None:
+            self.blocked_until = max(self.blocked_until, self.reset_at + self.reset_margin)
+        return self.retry_in()
+
+    def retry_in(self):
+        """Seconds until the queue will send again after being throttled."""
+        return max(self.blocked_until - time.time(), 0.0)
+
+    def stats(self):
+        granted = sum(self.granted.values())
+        return {
+            "queued": sum(not future.cancelled() for _, _, future in self.waiters),
+            "granted": self.granted,
+            "throttled": self.throttled,
+            "retries": self.retries,
+            "mean_wait_seconds": self.wait_seconds / granted if granted else 0.0,
+            "limit": self.limit,
+            "remaining": self.remaining,
+            "reset_in_seconds": max(self.reset_at - time.time(), 0.0) if self.reset_at else None,
+            "current_rate": self.current_rate()
+        }
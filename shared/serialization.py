@@ -0,0 +1,133 @@
+"""Fast JSON encoding for resource payloads.
+
+Payloads are compact by default (no indentation or spaces after separators),
+which is cheaper to produce and noticeably smaller than indent=2. The fastest
+installed backend is used: orjson, then msgspec, then the standard library.
+Payloads whose shape is known are built from the slotted dataclasses below,
+which every backend encodes without an intermediate dict.
+"""
+import json
+from dataclasses import dataclass
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+@dataclass(slots=True)
+class Temperature:
+    current: float
+    feels_like: float
+    min: float
+    max: float
+    unit: str = "°C"
+
+@dataclass(slots=True)
+class Wind:
+    speed: float
+    direction: float
+
+@dataclass(slots=True)
+class CurrentWeather:
+    city: str
+    country: str
+    temperature: Temperature
+    humidity: float
+    wind: Wind
+    conditions: list
+    timestamp: str
+
+@dataclass(slots=True)
+class ForecastEntry:
+    time: str
+    temperature: float
+    conditions: list
+    humidity: float
+    wind_speed: float
+
+@dataclass(slots=True)
+class ForecastDay:
+    date: str
+    forecasts: list
+
+@dataclass(slots=True)
+class Forecast:
+    city: str
+    country: str
+    days: list
+
+@dataclass(slots=True)
+class Article:
+    title: str
+    source: str
+    author: str
+    published: str
+    url: str
+    description: str
+
+@dataclass(slots=True)
+class NewsResult:
+    topic: str
+    count: int
+    articles: list
+
+@dataclass(slots=True)
+class Repository:
+    name: str
+    description: str
+    url: str
+    stars: int
+    forks: int
+    language: str
+    created_at: str
+    updated_at: str
+
+@dataclass(slots=True)
+class RepositoryList:
+    username: str
+    repository_count: int
+    repositories: list
+
+def _struct_fields(obj):
+    # The standard library encoder does not know dataclasses; slots give the field names in order
+    try:
+        return {name: getattr(obj, name) for name in obj.__slots__}
+    except AttributeError:
+        raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def _dumps_json(obj, pretty):
+    if pretty:
+        return json.dumps(obj, indent=2, ensure_ascii=False, default=_struct_fields)
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False, default=_struct_fields)
+
+BACKENDS = {"json": (_dumps_json, json.loads)}
+
+if orjson is not None:
+    def _dumps_orjson(obj, pretty):
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if pretty else 0).decode()
+
+    BACKENDS["orjson"] = (_dumps_orjson, orjson.loads)
+
+if msgspec is not None:
+    _msgspec_encoder = msgspec.json.Encoder()
+
+    def _dumps_msgspec(obj, pretty):
+        encoded = _msgspec_encoder.encode(obj)
+        return (msgspec.json.format(encoded, indent=2) if pretty else encoded).decode()
+
+    BACKENDS["msgspec"] = (_dumps_msgspec, msgspec.json.decode)
+
+# Fastest available backend
+BACKEND = next(name for name in ("orjson", "msgspec", "json") if name in BACKENDS)
+
+def dumps(obj, pretty=False, backend=None):
+    """Encode obj (dicts, lists, scalars and the dataclasses above) as a JSON string."""
+    return BACKENDS[backend or BACKEND][0](obj, pretty)
+
+def loads(data, backend=None):
+    return BACKENDS[backend or BACKEND][1](data)
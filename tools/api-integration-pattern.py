@@ -1,42 +1,223 @@
-from mcp.server.fastmcp import FastMCP
+from collections import deque
+from contextlib import aclosing, asynccontextmanager
+from pathlib import Path
+from mcp.server.fastmcp import Context, FastMCP
+import asyncio
 import httpx
+import json
+import math
+import sys
 
-mcp = FastMCP("api-integration-server")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # repository root, for the shared package
+from shared.http_cache import ConditionalCache
+from shared.rate_limit import PRIORITIES, RateLimitExceeded, RateLimitScheduler
+
+try:
+    import h2  # noqa: F401 - httpx only negotiates HTTP/2 when the h2 package is installed
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# GitHub API connection settings
+GITHUB_API_URL = "https://api.github.com"
+HTTP2 = True                   # Use HTTP/2 when h2 is installed (multiplexes calls over one connection)
+MAX_CONNECTIONS = 20           # Upper bound on concurrent connections to the API
+MAX_KEEPALIVE_CONNECTIONS = 10 # Idle connections kept open for reuse
+KEEPALIVE_EXPIRY = 30.0        # Seconds an idle connection stays in the pool
+CONNECT_TIMEOUT = 5.0
+REQUEST_TIMEOUT = 10.0
+
+# Search pagination
+MAX_PER_PAGE = 100         # Largest page GitHub search returns
+SEARCH_RESULT_LIMIT = 1000 # GitHub search never returns more than this many results
+PAGE_CONCURRENCY = 4       # Pages fetched ahead of the one being streamed
+
+# Conditional-request cache limits
+CACHE_MAX_ENTRIES = 256
+CACHE_MAX_BYTES = 16 * 1024 * 1024
+
+# Request pacing (tightened further by the X-RateLimit-* headers GitHub returns)
+RATE_LIMIT_PER_SECOND = 10.0
+RATE_LIMIT_BURST = 10
+
+# Shared client, opened when the server starts and closed when it stops
+http_client = None
+
+# Stored responses are revalidated with ETags, so repeated searches cost a 304 instead of a full payload
+response_cache = ConditionalCache(CACHE_MAX_ENTRIES, CACHE_MAX_BYTES)
+
+# Outgoing requests queue here so bursts are paced instead of tripping GitHub's limits
+scheduler = RateLimitScheduler(RATE_LIMIT_PER_SECOND, RATE_LIMIT_BURST)
+
+def create_http_client() -> httpx.AsyncClient:
+    """Create a pooled client so calls reuse connections instead of redoing DNS/TCP/TLS setup."""
+    return httpx.AsyncClient(
+        base_url=GITHUB_API_URL,
+        headers={"Accept": "application/vnd.github.v3+json", "User-Agent": "MCP-Server-Example"},
+        http2=HTTP2 and HTTP2_AVAILABLE,
+        limits=httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=KEEPALIVE_EXPIRY
+        ),
+        timeout=httpx.Timeout(REQUEST_TIMEOUT, connect=CONNECT_TIMEOUT)
+    )
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the shared client, creating it if the tools run outside the server lifespan."""
+    global http_client
+    if http_client is None or http_client.is_closed:
+        http_client = create_http_client()
+    return http_client
+
+active_sessions = 0
+
+@asynccontextmanager
+async def lifespan(server):
+    """Open the shared HTTP client for the first session and close it when the last one ends.
+    
+    FastMCP enters the lifespan once per session, and the HTTP transports run
+    one session per client, so the client is shared by every open session.
+    """
+    global http_client, active_sessions
+    active_sessions += 1
+    get_http_client()
+    try:
+        yield
+    finally:
+        active_sessions -= 1
+        if not active_sessions and http_client is not None:
+            client, http_client = http_client, None
+            await client.aclose()
+
+mcp = FastMCP("api-integration-server", lifespan=lifespan)
+
+class GitHubAPIError(Exception):
+    """A GitHub request that failed or returned an unusable response."""
+
+async def fetch_github(url, params=None, priority="interactive"):
+    """GET a GitHub API URL over the pooled client, through the cache and rate-limit scheduler."""
+    try:
+        response = await scheduler.request(
+            lambda: response_cache.get(get_http_client(), url, params=params), priority=priority
+        )
+    except httpx.HTTPError as e:
+        raise GitHubAPIError(f"GitHub API request failed: {str(e) or type(e).__name__}")
+    except RateLimitExceeded as e:
+        raise GitHubAPIError(f"GitHub rate limit exceeded. Try again in {e.retry_in:.0f} seconds.")
+    
+    if scheduler.is_throttled(response):
+        raise GitHubAPIError(f"GitHub rate limit exceeded. Try again in {scheduler.retry_in():.0f} seconds.")
+    
+    if response.status_code != 200:
+        raise GitHubAPIError(f"GitHub API returned status code {response.status_code}")
+    
+    return response
+
+async def iter_search_pages(result_type, query, max_results, priority="interactive"):
+    """Yield search result pages in order until max_results items have been produced.
+    
+    Page URLs come from the Link header of the first response. When it names
+    the last page, up to PAGE_CONCURRENCY following pages are fetched ahead
+    while earlier ones are consumed; otherwise "next" links are followed one
+    at a time.
+    """
+    per_page = min(max_results, MAX_PER_PAGE)
+    response = await fetch_github(f"/search/{result_type}", {"q": query, "per_page": per_page}, priority)
+    data = response.json()
+    yield data
+    
+    pages = math.ceil(min(max_results, data["total_count"], SEARCH_RESULT_LIMIT) / per_page)
+    links = response.links
+    if pages <= 1 or "next" not in links:
+        return
+    
+    if "last" not in links:
+        for _ in range(pages - 1):
+            if "next" not in links:
+                return
+            response = await fetch_github(links["next"], priority=priority)
+            links = response.links
+            yield response.json()
+        return
+    
+    next_url = httpx.URL(links["next"])
+    pages = min(pages, int(httpx.URL(links["last"]).params.get("page", pages)))
+    page_urls = (str(next_url.copy_set_param("page", page)) for page in range(2, pages + 1))
+    
+    pending = deque()
+    try:
+        for page_url in page_urls:
+            pending.append(asyncio.create_task(fetch_github(page_url, priority=priority)))
+            if len(pending) < PAGE_CONCURRENCY:
+                continue
+            yield (await pending.popleft()).json()
+        
+        while pending:
+            yield (await pending.popleft()).json()
+    finally:
+        # The consumer may stop early (enough results, error, cancellation); retrieve every
+        # prefetched task's outcome so failures after that point are not reported as unhandled
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+def format_item(item, result_type):
+    if result_type == "repositories":
+        return f"- {item['full_name']}: {item['description'] or 'No description'} ({item['stargazers_count']} stars)"
+    elif result_type == "users":
+        return f"- {item['login']}: {item['html_url']}"
+    return f"- {item['title']} ({item['state']}): {item['html_url']}"
 
 @mcp.tool()
-async def github_search(query: str, result_type: str = "repositories") -> str:
+async def github_search(query: str, result_type: str = "repositories", priority: str = "interactive",
+                        max_results: int = 5, ctx: Context = None) -> str:
     """Search GitHub for repositories, users, or issues.
     
     Args:
         query: Search query
         result_type: Type of results to return (repositories, users, issues)
+        priority: "interactive" for answers a user is waiting on, "bulk" for background work that can be delayed
+        max_results: Number of results to fetch (up to 1000); progress is reported as each page arrives
     """
     allowed_types = ["repositories", "users", "issues"]
     if result_type not in allowed_types:
         return f"Invalid result_type. Must be one of: {', '.join(allowed_types)}"
     
-    # Build GitHub API URL
-    url = f"https://api.github.com/search/{result_type}"
-    params = {"q": query, "per_page": 5}
+    if priority not in PRIORITIES:
+        return f"Invalid priority. Must be one of: {', '.join(PRIORITIES)}"
     
-    # Make API request
-    async with httpx.AsyncClient() as client:
-        headers = {"Accept": "application/vnd.github.v3+json"}
-        response = await client.get(url, params=params, headers=headers)
-        
-        if response.status_code != 200:
-            return f"Error: GitHub API returned status code {response.status_code}"
-        
-        data = response.json()
-        
-        # Format results
-        results = []
-        for item in data["items"]:
-            if result_type == "repositories":
-                results.append(f"- {item['full_name']}: {item['description'] or 'No description'} ({item['stargazers_count']} stars)")
-            elif result_type == "users":
-                results.append(f"- {item['login']}: {item['html_url']}")
-            elif result_type == "issues":
-                results.append(f"- {item['title']} ({item['state']}): {item['html_url']}")
-        
-        return f"Found {data['total_count']} results. Here are the top {len(results)}:\n\n" + "\n".join(results)
+    max_results = max(1, min(max_results, SEARCH_RESULT_LIMIT))
+    
+    # Format each page as it arrives and report progress; the tool result is still a single message
+    results = []
+    total_count = 0
+    note = ""
+    try:
+        async with aclosing(iter_search_pages(result_type, query, max_results, priority)) as pages:
+            async for page in pages:
+                total_count = page["total_count"]
+                page_results = [format_item(item, result_type) for item in page["items"][:max_results - len(results)]]
+                results.extend(page_results)
+                
+                if ctx is not None and page_results:
+                    await ctx.report_progress(len(results), min(max_results, total_count))
+                
+                if len(results) >= max_results:
+                    break
+    except GitHubAPIError as e:
+        if not results:
+            return f"Error: {str(e)}"
+        note = f"\n(Stopped after {len(results)} results: {str(e)})"
+    
+    return f"Found {total_count} results. Here are the top {len(results)}:\n\n" + "\n".join(results) + note
+
+@mcp.tool()
+async def github_cache_stats() -> str:
+    """Report how often GitHub responses were revalidated from the cache instead of re-downloaded."""
+    return json.dumps(response_cache.stats(), indent=2)
+
+@mcp.tool()
+async def github_rate_limit_stats() -> str:
+    """Report the remaining GitHub request budget and how requests have been queued."""
+    return json.dumps(scheduler.stats(), indent=2)
@@ -1,64 +1,1494 @@
+import hashlib
+import json
+import mmap
+import os
+import re
+import shutil
+import threading
+import time
+from collections import Counter, OrderedDict
 import numpy as np
-from scipy.spatial.distance import cosine
 from mcp.server.fastmcp import FastMCP
 
 mcp = FastMCP("semantic-search-server")
 
+# Index used by the server: "flat" scans every vector (exact), "ivf" only
+# scans the clusters closest to the query (approximate, for large corpora)
+INDEX_TYPE = "flat"
+INDEX_PARAMS = {}
+
+# Directory of a persisted store written by VectorDB.save(). When present the
+# server memory-maps it at startup instead of building the mock corpus.
+STORE_PATH = "vector_store"
+
+# Optional compression of the stored vectors: None keeps float32, "int8" uses
+# 8-bit scalar quantization (4x smaller), "pq" product quantization (up to 32x)
+QUANTIZATION = None
+QUANTIZATION_PARAMS = {}
+
+# Query embeddings are cached so repeated queries skip the embedding model
+EMBEDDING_CACHE_SIZE = 10000
+EMBEDDING_CACHE_TTL_SECONDS = 3600
+
+def normalize(vectors):
+    """Scale vectors to unit length so a dot product equals cosine similarity."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+def top_k_indices(scores, top_k):
+    """Return the positions of the top_k highest scores, best first.
+    
+    argpartition selects the candidates in O(n); only those k are sorted.
+    """
+    top_k = min(top_k, len(scores))
+    if top_k <= 0:
+        return np.empty(0, dtype=np.int64)
+    candidates = np.argpartition(-scores, top_k - 1)[:top_k]
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+def nearest_centroids(vectors, centroids, spherical=True, batch_size=65536):
+    """Assign each vector to its closest centroid, in batches.
+    
+    Spherical (unit length) centroids are compared by dot product; otherwise
+    squared Euclidean distance is used, expanded so it is still one matrix product.
+    """
+    bias = 0 if spherical else -0.5 * np.einsum("ij,ij->i", centroids, centroids)
+    assignments = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), batch_size):
+        batch = np.ascontiguousarray(vectors[start:start + batch_size], dtype=np.float32)
+        assignments[start:start + batch_size] = np.argmax(batch @ centroids.T + bias, axis=1)
+    return assignments
+
+def train_kmeans(vectors, k, iterations=10, sample_size=None, spherical=True, seed=0):
+    """Lloyd's k-means over (a sample of) the vectors.
+    
+    Spherical k-means keeps centroids unit length so they can be scored by dot
+    product; plain k-means minimizes Euclidean error, which quantizers need.
+    """
+    rng = np.random.default_rng(seed)
+    if sample_size is not None and len(vectors) > sample_size:
+        vectors = vectors[np.sort(rng.choice(len(vectors), sample_size, replace=False))]
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    centroids = vectors[rng.choice(len(vectors), k, replace=False)].copy()
+    
+    for _ in range(iterations):
+        assignments = nearest_centroids(vectors, centroids, spherical=spherical)
+        counts = np.bincount(assignments, minlength=k)
+        
+        # Sum each cluster's members with one reduceat over the rows sorted by cluster
+        order = np.argsort(assignments, kind="stable")
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        sums = np.zeros_like(centroids)
+        sums[counts > 0] = np.add.reduceat(vectors[order], starts[counts > 0], axis=0)
+        
+        # Re-seed empty clusters with random points so every centroid gets used
+        empty = counts == 0
+        if empty.any():
+            sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()))]
+            counts[empty] = 1
+        centroids = normalize(sums) if spherical else sums / counts[:, None]
+    
+    return centroids
+
+def open_matrix(path, dtype, shape):
+    """Memory-map a raw array file read-only (empty arrays cannot be mapped)."""
+    if shape[0] == 0:
+        return np.empty(shape, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", shape=shape)
+
+class FlatIndex:
+    """Exact search: every vector is a candidate."""
+    
+    def params(self):
+        return {}
+    
+    def build(self, vectors):
+        pass
+    
+    def save(self, path):
+        pass
+    
+    def load(self, path):
+        pass
+    
+    def candidates(self, query, **params):
+        # None means "score the whole matrix"
+        return None
+
+class IVFFlatIndex:
+    """Inverted-file index: vectors are bucketed by their nearest k-means centroid.
+    
+    A query only scans the `nprobe` buckets whose centroids are closest to it,
+    trading a little recall for a scan that is roughly nprobe/nlist of the corpus.
+    """
+    
+    def __init__(self, nlist=1024, nprobe=16, iterations=10, seed=0):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.iterations = iterations
+        self.seed = seed
+    
+    def params(self):
+        return {"nlist": self.nlist, "nprobe": self.nprobe, "iterations": self.iterations, "seed": self.seed}
+    
+    def build(self, vectors):
+        nlist = max(1, min(self.nlist, len(vectors)))
+        self.centroids = train_kmeans(
+            vectors, nlist,
+            iterations=self.iterations,
+            sample_size=nlist * 256,  # enough points per centroid to train on
+            seed=self.seed
+        )
+        
+        # Store the lists as one array of row positions sorted by bucket,
+        # with offsets marking where each bucket starts
+        assignments = nearest_centroids(vectors, self.centroids)
+        self.order = np.argsort(assignments, kind="stable")
+        self.offsets = np.concatenate(([0], np.cumsum(np.bincount(assignments, minlength=nlist))))
+    
+    def save(self, path):
+        np.save(os.path.join(path, "ivf_centroids.npy"), self.centroids)
+        np.save(os.path.join(path, "ivf_order.npy"), self.order)
+        np.save(os.path.join(path, "ivf_offsets.npy"), self.offsets)
+    
+    def load(self, path):
+        # Mapped like the vectors, so loading a trained index costs no training
+        self.centroids = np.load(os.path.join(path, "ivf_centroids.npy"), mmap_mode="r")
+        self.order = np.load(os.path.join(path, "ivf_order.npy"), mmap_mode="r")
+        self.offsets = np.load(os.path.join(path, "ivf_offsets.npy"), mmap_mode="r")
+    
+    def candidates(self, query, nprobe=None, **params):
+        probe = top_k_indices(self.centroids @ query, self.nprobe if nprobe is None else nprobe)
+        return np.concatenate([
+            self.order[self.offsets[c]:self.offsets[c + 1]] for c in probe
+        ])
+
+INDEX_TYPES = {
+    "flat": FlatIndex,
+    "ivf": IVFFlatIndex
+}
+
+class ScalarQuantizer:
+    """8-bit scalar quantization: every dimension is mapped linearly onto 256 levels.
+    
+    Codes take a quarter of the float32 memory. Queries stay float32 and are
+    scored directly against the codes (asymmetric distance), so only the stored
+    side loses precision.
+    """
+    
+    def __init__(self, batch_size=65536):
+        self.batch_size = batch_size
+    
+    def params(self):
+        return {"batch_size": self.batch_size}
+    
+    def train(self, vectors):
+        self.low = np.asarray(vectors.min(axis=0), dtype=np.float32)
+        self.scale = (np.asarray(vectors.max(axis=0), dtype=np.float32) - self.low) / 255
+        self.scale[self.scale == 0] = 1.0
+    
+    def encode(self, vectors):
+        codes = np.empty(vectors.shape, dtype=np.int8)
+        for start in range(0, len(vectors), self.batch_size):
+            levels = np.round((vectors[start:start + self.batch_size] - self.low) / self.scale)
+            codes[start:start + self.batch_size] = np.clip(levels, 0, 255) - 128
+        return codes
+    
+    def score(self, codes, query):
+        # x ~= low + scale * (code + 128), so q.x is one product with the codes plus a constant.
+        # query may also be a (queries x dim) matrix, scoring every query per decoded batch.
+        weights = query * self.scale
+        bias = query @ self.low + 128 * weights.sum(axis=-1)
+        
+        # Decode in batches so the float32 working set stays bounded
+        scores = np.empty((len(codes),) + np.shape(bias), dtype=np.float32)
+        for start in range(0, len(codes), self.batch_size):
+            scores[start:start + self.batch_size] = codes[start:start + self.batch_size].astype(np.float32) @ weights.T
+        return scores + bias
+    
+    def save(self, path):
+        np.save(os.path.join(path, "sq_low.npy"), self.low)
+        np.save(os.path.join(path, "sq_scale.npy"), self.scale)
+    
+    def load(self, path):
+        self.low = np.load(os.path.join(path, "sq_low.npy"))
+        self.scale = np.load(os.path.join(path, "sq_scale.npy"))
+
+class ProductQuantizer:
+    """Product quantization: vectors are split into m sub-vectors and each one is
+    replaced by the id of its nearest sub-centroid (one byte per sub-vector).
+    
+    A query builds an m x 256 table of dot products with the sub-centroids once,
+    after which each stored vector is scored with m table lookups.
+    """
+    
+    def __init__(self, m=8, iterations=10, seed=0, batch_size=65536):
+        self.m = m
+        self.iterations = iterations
+        self.seed = seed
+        self.batch_size = batch_size
+    
+    def params(self):
+        return {"m": self.m, "iterations": self.iterations, "seed": self.seed, "batch_size": self.batch_size}
+    
+    def _split(self, vectors):
+        # (n, dim) -> (n, m, dim / m)
+        return np.asarray(vectors, dtype=np.float32).reshape(len(vectors), self.m, -1)
+    
+    def train(self, vectors):
+        if vectors.shape[1] % self.m:
+            raise ValueError(f"Vector dimension {vectors.shape[1]} is not divisible by m={self.m}")
+        
+        # 64 points per sub-centroid is plenty to train 256-entry codebooks
+        rng = np.random.default_rng(self.seed)
+        sample = vectors
+        if len(vectors) > 64 * 256:
+            sample = vectors[np.sort(rng.choice(len(vectors), 64 * 256, replace=False))]
+        sample = self._split(sample)
+        
+        ksub = min(256, len(sample))
+        self.codebooks = np.stack([
+            train_kmeans(sample[:, j], ksub, iterations=self.iterations, spherical=False, seed=self.seed)
+            for j in range(self.m)
+        ])
+    
+    def encode(self, vectors):
+        codes = np.empty((len(vectors), self.m), dtype=np.uint8)
+        for start in range(0, len(vectors), self.batch_size):
+            batch = self._split(vectors[start:start + self.batch_size])
+            for j in range(self.m):
+                codes[start:start + self.batch_size, j] = nearest_centroids(
+                    batch[:, j], self.codebooks[j], spherical=False
+                )
+        return codes
+    
+    def score(self, codes, query):
+        if query.ndim == 2:
+            # Every query needs its own lookup table
+            return np.stack([self.score(codes, q) for q in query], axis=1)
+        
+        # table[j, c] = query sub-vector j . sub-centroid c of subspace j
+        table = np.einsum("mkd,md->mk", self.codebooks, query.reshape(self.m, -1))
+        subspaces = np.arange(self.m)
+        
+        scores = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), self.batch_size):
+            scores[start:start + self.batch_size] = table[subspaces, codes[start:start + self.batch_size]].sum(axis=1)
+        return scores
+    
+    def save(self, path):
+        np.save(os.path.join(path, "pq_codebooks.npy"), self.codebooks)
+    
+    def load(self, path):
+        self.codebooks = np.load(os.path.join(path, "pq_codebooks.npy"))
+
+QUANTIZERS = {
+    "int8": ScalarQuantizer,
+    "pq": ProductQuantizer
+}
+
+# Identifiers such as "SKU-1234-AB" or "v2.1" stay whole tokens (and their
+# parts are indexed too) so exact codes can be matched
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-_./][a-z0-9]+)*")
+
+def tokenize(text):
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        tokens.append(token)
+        parts = re.split(r"[-_./]", token)
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+def document_text(doc):
+    return f"{doc.get('title', '')} {doc.get('content', '')}"
+
+def narrowest_uint(max_value):
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if max_value <= np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(np.uint64)
+
+class InvertedIndex:
+    """BM25 keyword index over the documents of one segment.
+    
+    Each term's postings are row ids, delta-encoded, followed by term
+    frequencies, each packed into the narrowest unsigned type that fits the
+    term's largest gap or frequency. Every SKIP_INTERVAL postings a skip entry
+    records the last row id so far, which lets a search decode only the part
+    of a list that can contain a given row.
+    
+    Searches use MaxScore: terms are visited from the highest score upper bound
+    down, and once the bounds of the remaining terms cannot lift an unseen
+    document into the top_k, those terms are only probed for documents that
+    are already candidates instead of being scanned.
+    """
+    
+    SKIP_INTERVAL = 128
+    K1 = 1.2
+    B = 0.75
+    
+    def build(self, documents, count):
+        postings = {}
+        self.lengths = np.zeros(count, dtype=np.int32)
+        
+        for row in range(count):
+            tokens = tokenize(document_text(documents[row]))
+            self.lengths[row] = len(tokens)
+            for term, tf in Counter(tokens).items():
+                postings.setdefault(term, []).append((row, tf))
+        
+        self.total_length = int(self.lengths.sum())
+        self.terms = {}
+        data = bytearray()
+        skips = []
+        
+        for term, entries in postings.items():
+            rows = np.fromiter((row for row, _ in entries), dtype=np.int64, count=len(entries))
+            tfs = np.fromiter((tf for _, tf in entries), dtype=np.int64, count=len(entries))
+            gaps = np.diff(rows, prepend=-1)
+            doc_type, tf_type = narrowest_uint(gaps.max()), narrowest_uint(tfs.max())
+            
+            # term -> (offset, count, gap type, tf type, first skip, max tf, min length)
+            self.terms[term] = (
+                len(data), len(rows), doc_type.str, tf_type.str, len(skips),
+                int(tfs.max()), int(self.lengths[rows].min())
+            )
+            data += gaps.astype(doc_type).tobytes() + tfs.astype(tf_type).tobytes()
+            skips.extend(rows[self.SKIP_INTERVAL - 1::self.SKIP_INTERVAL].tolist())
+            if len(rows) % self.SKIP_INTERVAL:
+                skips.append(int(rows[-1]))
+        
+        self.data = bytes(data)
+        self.skips = np.asarray(skips, dtype=np.int64)
+    
+    def save(self, path):
+        with open(os.path.join(path, "keywords.bin"), "wb") as f:
+            f.write(self.data)
+        np.save(os.path.join(path, "keyword_skips.npy"), self.skips)
+        np.save(os.path.join(path, "keyword_lengths.npy"), self.lengths)
+        with open(os.path.join(path, "keyword_terms.json"), "w") as f:
+            json.dump({"total_length": self.total_length, "terms": self.terms}, f)
+    
+    def load(self, path):
+        with open(os.path.join(path, "keyword_terms.json")) as f:
+            metadata = json.load(f)
+        self.total_length = metadata["total_length"]
+        self.terms = {term: tuple(entry) for term, entry in metadata["terms"].items()}
+        
+        self.skips = np.load(os.path.join(path, "keyword_skips.npy"), mmap_mode="r")
+        self.lengths = np.load(os.path.join(path, "keyword_lengths.npy"), mmap_mode="r")
+        with open(os.path.join(path, "keywords.bin"), "rb") as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self.skips.size else b""
+    
+    def doc_freq(self, term):
+        entry = self.terms.get(term)
+        return entry[1] if entry else 0
+    
+    def _decode(self, term, start=0, end=None):
+        """Row ids and term frequencies of postings start:end of a term's list."""
+        offset, count, doc_type, tf_type, first_skip, _, _ = self.terms[term]
+        doc_type, tf_type = np.dtype(doc_type), np.dtype(tf_type)
+        end = count if end is None else min(end, count)
+        
+        gaps = np.frombuffer(self.data, doc_type, end - start, offset + start * doc_type.itemsize)
+        tfs = np.frombuffer(self.data, tf_type, end - start, offset + count * doc_type.itemsize + start * tf_type.itemsize)
+        
+        # Gaps restart from the last row id before `start`, which a skip entry holds
+        previous = -1 if start == 0 else self.skips[first_skip + start // self.SKIP_INTERVAL - 1]
+        return previous + np.cumsum(gaps, dtype=np.int64), tfs.astype(np.float32)
+    
+    def probe(self, term, rows):
+        """Term frequencies of a term in the given sorted rows (0 where absent)."""
+        offset, count, doc_type, tf_type, first_skip, _, _ = self.terms[term]
+        doc_type, tf_type = np.dtype(doc_type), np.dtype(tf_type)
+        skips = self.skips[first_skip:first_skip + -(-count // self.SKIP_INTERVAL)]
+        
+        # Only the skip intervals some candidate row falls into are decoded
+        intervals = np.searchsorted(skips, rows)
+        intervals = np.unique(intervals[intervals < len(skips)])
+        if len(rows) == 0 or len(intervals) == 0:
+            return np.zeros(len(rows), dtype=np.float32)
+        
+        starts = intervals * self.SKIP_INTERVAL
+        lengths = np.minimum(starts + self.SKIP_INTERVAL, count) - starts
+        
+        # Gather the postings of all selected intervals at once, then undo the
+        # delta encoding with one cumsum, restarting at each interval's skip entry
+        first = np.cumsum(lengths) - lengths
+        positions = np.repeat(starts - first, lengths) + np.arange(lengths.sum())
+        gaps = np.frombuffer(self.data, doc_type, count, offset)[positions].astype(np.int64)
+        tfs = np.frombuffer(self.data, tf_type, count, offset + count * doc_type.itemsize)[positions]
+        
+        totals = np.cumsum(gaps)
+        before = np.where(first > 0, totals[first - 1], 0)
+        previous = np.where(intervals > 0, skips[np.maximum(intervals - 1, 0)], -1)
+        decoded = totals + np.repeat(previous - before, lengths)
+        
+        found = np.minimum(np.searchsorted(decoded, rows), len(decoded) - 1)
+        return np.where(decoded[found] == rows, tfs[found], 0).astype(np.float32)
+    
+    def _bm25(self, idf, tfs, lengths, avgdl):
+        return idf * tfs * (self.K1 + 1) / (tfs + self.K1 * (1 - self.B + self.B * lengths / avgdl))
+    
+    def search(self, idfs, avgdl, live, top_k, threshold=0.0):
+        """Rows and BM25 scores of the best live documents scoring above threshold.
+        
+        idfs maps query terms to their collection-wide IDF, so scores are
+        comparable across segments; threshold is the top_k-th score already
+        found in other segments.
+        """
+        terms = [term for term in idfs if term in self.terms]
+        
+        # Score upper bound per term: highest tf in the shortest document
+        bounds = {}
+        for term in terms:
+            max_tf, min_length = self.terms[term][5], self.terms[term][6]
+            bounds[term] = float(self._bm25(idfs[term], max_tf, min_length, avgdl))
+        terms.sort(key=lambda term: bounds[term], reverse=True)
+        
+        rows = np.empty(0, dtype=np.int64)
+        scores = np.empty(0, dtype=np.float32)
+        remaining = sum(bounds.values())
+        
+        for term in terms:
+            if remaining > threshold:
+                # Essential term: a document seen only from here on could still qualify
+                term_rows, tfs = self._decode(term)
+                term_scores = self._bm25(idfs[term], tfs, self.lengths[term_rows], avgdl)
+                rows, inverse = np.unique(np.concatenate((rows, term_rows)), return_inverse=True)
+                scores = np.bincount(inverse, weights=np.concatenate((scores, term_scores))).astype(np.float32)
+            else:
+                # Non-essential: drop candidates that cannot reach the threshold,
+                # then look the term up only for the survivors
+                keep = scores + remaining > threshold
+                rows, scores = rows[keep], scores[keep]
+                tfs = self.probe(term, rows)
+                present = tfs > 0
+                scores[present] += self._bm25(idfs[term], tfs[present], self.lengths[rows[present]], avgdl)
+            
+            remaining -= bounds[term]
+            
+            # Scores only grow, so the current top_k-th live score is a safe threshold
+            live_scores = scores[live[rows]]
+            if len(live_scores) >= top_k:
+                threshold = max(threshold, float(np.partition(live_scores, -top_k)[-top_k]))
+        
+        keep = live[rows] & (scores >= threshold)
+        rows, scores = rows[keep], scores[keep]
+        best = top_k_indices(scores, top_k)
+        return rows[best], scores[best]
+
+# Range operator -> (bound it sets, np.searchsorted side)
+RANGE_OPERATORS = {
+    "gt": ("lower", "right"),
+    "gte": ("lower", "left"),
+    "lt": ("upper", "left"),
+    "lte": ("upper", "right")
+}
+
+def check_filters(filters):
+    """Raise ValueError unless every condition is a value, a list of values, or a range dict."""
+    if not isinstance(filters, dict):
+        raise ValueError("Filters must map field names to conditions")
+    for name, condition in filters.items():
+        if isinstance(condition, dict):
+            unknown = set(condition) - set(RANGE_OPERATORS)
+            if unknown:
+                raise ValueError(
+                    f"Unknown operator '{unknown.pop()}' for field '{name}'. "
+                    f"Must be one of: {', '.join(RANGE_OPERATORS)}"
+                )
+            values = condition.values()
+        elif isinstance(condition, list):
+            values = condition
+        else:
+            values = [condition]
+        if not all(isinstance(value, (str, int, float)) for value in values):
+            raise ValueError(
+                f"Condition for field '{name}' must be a string or number, a list of them, "
+                f"or a range such as {{\"gte\": ..., \"lt\": ...}}"
+            )
+
+class MetadataIndex:
+    """Bitmap indexes over document metadata fields, used to pre-filter searches.
+    
+    Each field maps its distinct values to the rows holding them, stored
+    roaring-style: a sorted array of row numbers while the set is sparse, a
+    packed bitmap once that is smaller. A field is indexed the first time a
+    filter uses it and is saved with the segment from then on.
+    
+    Range conditions use a second, in-memory layout built from the first on
+    demand: the field's distinct values sorted, with every row listed in value
+    order, so a range is two binary searches and one slice of rows.
+    """
+    
+    def __init__(self, documents, count):
+        self.documents = documents
+        self.count = count
+        self.fields = {}  # field -> {value: ("rows" | "bits", array)}
+        self.sorted_fields = {}  # field -> {"number" | "str": (sorted values, row offsets, rows)}
+    
+    def _row_set(self, rows):
+        rows = np.asarray(rows, dtype=np.int32)
+        if rows.nbytes <= -(-self.count // 8):
+            return ("rows", rows)
+        mask = np.zeros(self.count, dtype=bool)
+        mask[rows] = True
+        return ("bits", np.packbits(mask))
+    
+    def field(self, name):
+        if name not in self.fields:
+            values = {}
+            for row in range(self.count):
+                value = self.documents[row].get(name)
+                if isinstance(value, (str, int, float)):
+                    values.setdefault(value, []).append(row)
+            self.fields[name] = {value: self._row_set(rows) for value, rows in values.items()}
+        return self.fields[name]
+    
+    def sorted_field(self, name):
+        """Distinct values of a field in sorted order, separately for numbers and strings."""
+        if name not in self.sorted_fields:
+            groups = {"number": [], "str": []}
+            for value, (kind, data) in self.field(name).items():
+                if isinstance(value, str):
+                    groups["str"].append(value)
+                elif value == value:  # NaN never falls in a range
+                    groups["number"].append(value)
+            
+            sorted_groups = {}
+            for group, values in groups.items():
+                if not values:
+                    continue
+                values.sort()
+                row_lists = []
+                for value in values:
+                    kind, data = self.fields[name][value]
+                    row_lists.append(data if kind == "rows" else np.flatnonzero(np.unpackbits(data, count=self.count)))
+                offsets = np.zeros(len(values) + 1, dtype=np.int64)
+                np.cumsum([len(rows) for rows in row_lists], out=offsets[1:])
+                sorted_groups[group] = (np.array(values), offsets, np.concatenate(row_lists).astype(np.int32))
+            self.sorted_fields[name] = sorted_groups
+        return self.sorted_fields[name]
+    
+    def _range(self, name, condition):
+        # Bounds compare with values of their own type only
+        if all(isinstance(bound, str) for bound in condition.values()):
+            group = "str"
+        elif all(isinstance(bound, (int, float)) for bound in condition.values()):
+            group = "number"
+        else:
+            return []
+        if group not in self.sorted_field(name):
+            return []
+        values, offsets, rows = self.sorted_field(name)[group]
+        
+        start, stop = 0, len(values)
+        for op, bound in condition.items():
+            limit, side = RANGE_OPERATORS[op]
+            position = int(np.searchsorted(values, bound, side=side))
+            if limit == "lower":
+                start = max(start, position)
+            else:
+                stop = min(stop, position)
+        
+        if start >= stop:
+            return []
+        return [("rows", rows[offsets[start]:offsets[stop]])]
+    
+    def _matching(self, name, condition):
+        values = self.field(name)
+        
+        if isinstance(condition, dict):
+            return self._range(name, condition)
+        
+        if isinstance(condition, list):
+            return [values[value] for value in condition if value in values]
+        
+        return [values[condition]] if condition in values else []
+    
+    def mask(self, filters):
+        """Rows matching every field condition.
+        
+        A condition is a value, a list of accepted values, or a range such as
+        {"gte": "2024-01-01", "lt": "2025-01-01"}.
+        """
+        check_filters(filters)
+        mask = np.ones(self.count, dtype=bool)
+        for name, condition in filters.items():
+            field_mask = np.zeros(self.count, dtype=bool)
+            for kind, data in self._matching(name, condition):
+                if kind == "rows":
+                    field_mask[data] = True
+                else:
+                    field_mask |= np.unpackbits(data, count=self.count).view(bool)
+            mask &= field_mask
+        return mask
+    
+    def save(self, path):
+        data = bytearray()
+        fields = {}
+        for name, values in self.fields.items():
+            fields[name] = []
+            for value, (kind, array) in values.items():
+                fields[name].append([value, kind, len(data), len(array)])
+                data += array.tobytes()
+        
+        with open(os.path.join(path, "metadata_fields.bin"), "wb") as f:
+            f.write(data)
+        with open(os.path.join(path, "metadata_fields.json"), "w") as f:
+            json.dump(fields, f)
+    
+    def load(self, path):
+        with open(os.path.join(path, "metadata_fields.json")) as f:
+            fields = json.load(f)
+        with open(os.path.join(path, "metadata_fields.bin"), "rb") as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b""
+        
+        for name, values in fields.items():
+            self.fields[name] = {
+                value: (kind, np.frombuffer(data, np.int32 if kind == "rows" else np.uint8, length, offset))
+                for value, kind, offset, length in values
+            }
+
+class MappedDocuments:
+    """Documents stored as JSON lines and decoded on demand.
+    
+    Row i is the byte range offsets[i]:offsets[i + 1] of the file, so only the
+    documents a search actually returns are ever read or parsed.
+    """
+    
+    def __init__(self, path, offsets):
+        self.offsets = offsets
+        with open(path, "rb") as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if len(offsets) > 1 else b""
+    
+    def __len__(self):
+        return len(self.offsets) - 1
+    
+    def __getitem__(self, position):
+        return json.loads(self.data[self.offsets[position]:self.offsets[position + 1]])
+
+def create_index(index_type, index_params):
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type '{index_type}'. Must be one of: {', '.join(INDEX_TYPES)}")
+    return INDEX_TYPES[index_type](**index_params)
+
+def create_quantizer(quantization, quantization_params):
+    if quantization is None:
+        return None
+    if quantization not in QUANTIZERS:
+        raise ValueError(f"Unknown quantization '{quantization}'. Must be one of: {', '.join(QUANTIZERS)}")
+    return QUANTIZERS[quantization](**quantization_params)
+
+class Segment:
+    """An immutable batch of documents with their vectors, index and codes.
+    
+    Rows are never rewritten: deleting or replacing a document only clears its
+    flag in `live` (a tombstone), so searches keep reading a segment while
+    writes and compactions happen around it.
+    """
+    
+    def __init__(self, name, documents, ids, embeddings, index, quantizer=None, codes=None, live=None):
+        self.name = name
+        self.documents = documents
+        self.ids = ids
+        self.embeddings = embeddings
+        self.index = index
+        self.quantizer = quantizer
+        self.codes = codes
+        self.live = np.ones(len(ids), dtype=bool) if live is None else live
+        self.deleted = int(len(ids) - np.count_nonzero(self.live))
+        self.path = None  # directory the segment is memory-mapped from, if any
+        self._sorted_ids = None
+        self._keyword_index = None
+        self._metadata_index = None
+    
+    @classmethod
+    def build(cls, name, documents, ids, vectors, index_type="flat", index_params=None,
+              quantization=None, quantization_params=None):
+        """Build a segment from row-aligned documents, ids and vectors."""
+        # Keep all vectors in one contiguous, pre-normalized float32 matrix
+        # (row i belongs to ids[i]) so a query is a single matrix-vector product
+        segment = cls(
+            name,
+            documents,
+            np.asarray(ids, dtype=np.int64),
+            np.ascontiguousarray(normalize(vectors)),
+            create_index(index_type, index_params or {}),
+            create_quantizer(quantization, quantization_params or {})
+        )
+        segment.index.build(segment.embeddings)
+        
+        if segment.quantizer is not None:
+            segment.quantizer.train(segment.embeddings)
+            segment.codes = segment.quantizer.encode(segment.embeddings)
+        
+        return segment
+    
+    def __len__(self):
+        return len(self.ids) - self.deleted
+    
+    @property
+    def index_type(self):
+        return next(name for name, cls in INDEX_TYPES.items() if isinstance(self.index, cls))
+    
+    @property
+    def quantization(self):
+        return next((name for name, cls in QUANTIZERS.items() if isinstance(self.quantizer, cls)), None)
+    
+    @property
+    def keyword_index(self):
+        """The segment's BM25 index, loaded from disk or built on first use."""
+        if self._keyword_index is None:
+            index = InvertedIndex()
+            if self.path is not None and os.path.exists(os.path.join(self.path, "keyword_terms.json")):
+                index.load(self.path)
+            else:
+                index.build(self.documents, len(self.ids))
+            self._keyword_index = index
+        return self._keyword_index
+    
+    @property
+    def metadata_index(self):
+        """Bitmaps over metadata fields, loaded from disk when the segment was saved with them."""
+        if self._metadata_index is None:
+            index = MetadataIndex(self.documents, len(self.ids))
+            if self.path is not None and os.path.exists(os.path.join(self.path, "metadata_fields.json")):
+                index.load(self.path)
+            self._metadata_index = index
+        return self._metadata_index
+    
+    def allowed_rows(self, filters=None):
+        """Mask of rows a search may return, or None when every row qualifies."""
+        if not filters:
+            return self.live if self.deleted else None
+        mask = self.metadata_index.mask(filters)
+        return mask & self.live if self.deleted else mask
+    
+    def positions_of(self, doc_id):
+        """Live rows holding doc_id, found by binary search over the sorted ids."""
+        if self._sorted_ids is None:
+            order = np.argsort(self.ids, kind="stable")
+            self._sorted_ids = (order, self.ids[order])
+        
+        order, sorted_ids = self._sorted_ids
+        start = np.searchsorted(sorted_ids, doc_id, side="left")
+        end = np.searchsorted(sorted_ids, doc_id, side="right")
+        positions = order[start:end]
+        return positions[self.live[positions]]
+    
+    def tombstone(self, positions):
+        self.live[positions] = False
+        self.deleted += len(positions)
+    
+    def save(self, path):
+        """Persist the segment as raw arrays plus sidecar files that load() can memory-map.
+        
+        Layout:
+            vectors.f32      row-major normalized float32 matrix (count x dim)
+            ids.i64          int64 document id of each row
+            documents.jsonl  one JSON document per row
+            offsets.i64      byte offset of each row in documents.jsonl (count + 1)
+            codes.npy        quantized vectors, when quantization is enabled
+            keyword*         BM25 postings, skip entries, lengths and vocabulary
+            metadata_fields* row sets of the metadata fields filtered on so far
+            live.npy         tombstone flags (False for deleted rows)
+            metadata.json    shape, index and quantization configuration
+        """
+        os.makedirs(path, exist_ok=True)
+        
+        np.ascontiguousarray(self.embeddings, dtype=np.float32).tofile(os.path.join(path, "vectors.f32"))
+        np.ascontiguousarray(self.ids, dtype=np.int64).tofile(os.path.join(path, "ids.i64"))
+        
+        offsets = [0]
+        with open(os.path.join(path, "documents.jsonl"), "wb") as f:
+            for position in range(len(self.ids)):
+                line = json.dumps(self.documents[position]).encode("utf-8") + b"\n"
+                f.write(line)
+                offsets.append(offsets[-1] + len(line))
+        np.asarray(offsets, dtype=np.int64).tofile(os.path.join(path, "offsets.i64"))
+        
+        self.index.save(path)
+        
+        if self.quantizer is not None:
+            np.save(os.path.join(path, "codes.npy"), self.codes)
+            self.quantizer.save(path)
+        
+        self.keyword_index.save(path)
+        self.metadata_index.save(path)
+        np.save(os.path.join(path, "live.npy"), self.live)
+        
+        # Written last: a segment without metadata is treated as incomplete
+        with open(os.path.join(path, "metadata.json"), "w") as f:
+            json.dump({
+                "version": 2,
+                "count": int(self.embeddings.shape[0]),
+                "dim": int(self.embeddings.shape[1]),
+                "index_type": self.index_type,
+                "index_params": self.index.params(),
+                "quantization": self.quantization,
+                "quantization_params": self.quantizer.params() if self.quantizer is not None else {}
+            }, f, indent=2)
+    
+    @classmethod
+    def load(cls, path, index_type=None, **index_params):
+        """Open a segment written by save() without reading the vectors into memory.
+        
+        Vectors, ids and offsets are memory-mapped read-only, so startup time does
+        not depend on corpus size and every process opening the same store shares
+        one copy through the OS page cache. The saved index is reused unless a
+        different index_type is requested, in which case it is rebuilt.
+        """
+        with open(os.path.join(path, "metadata.json")) as f:
+            metadata = json.load(f)
+        
+        count, dim = metadata["count"], metadata["dim"]
+        
+        rebuild = index_type is not None and index_type != metadata["index_type"]
+        index = create_index(
+            index_type if rebuild else metadata["index_type"],
+            index_params if rebuild else {**metadata["index_params"], **index_params}
+        )
+        quantizer = create_quantizer(metadata["quantization"], metadata["quantization_params"])
+        
+        segment = cls(
+            os.path.basename(os.path.normpath(path)),
+            MappedDocuments(
+                os.path.join(path, "documents.jsonl"),
+                open_matrix(os.path.join(path, "offsets.i64"), np.int64, (count + 1,))
+            ),
+            open_matrix(os.path.join(path, "ids.i64"), np.int64, (count,)),
+            open_matrix(os.path.join(path, "vectors.f32"), np.float32, (count, dim)),
+            index,
+            quantizer,
+            live=np.load(os.path.join(path, "live.npy"))  # small and mutable, so kept in memory
+        )
+        segment.path = os.path.abspath(path)
+        
+        # With quantization the float vectors stay on disk and are only paged
+        # in for re-ranking; the compact codes are what every query scans
+        if quantizer is not None:
+            quantizer.load(path)
+            segment.codes = np.load(os.path.join(path, "codes.npy"), mmap_mode="r")
+        
+        if rebuild:
+            index.build(segment.embeddings)
+        else:
+            index.load(path)
+        
+        return segment
+    
+    def memory_usage(self):
+        """Bytes used by the float32 vectors and by the codes that searches scan."""
+        vector_bytes = int(self.embeddings.nbytes)
+        code_bytes = int(self.codes.nbytes) if self.quantizer is not None else vector_bytes
+        return {"vectors": vector_bytes, "codes": code_bytes}
+    
+    def _approximate_scores(self, query, rows=None):
+        # query is one vector, or a matrix of queries giving one score column each
+        if self.quantizer is None:
+            vectors = self.embeddings if rows is None else self.embeddings[rows]
+            return vectors @ query.T
+        codes = self.codes if rows is None else self.codes[rows]
+        return self.quantizer.score(codes, query)
+    
+    def _finish(self, query, positions, scores, top_k, rerank):
+        """Turn a shortlist (best first) into the final top_k rows and scores."""
+        # Tombstoned rows score -inf and only reach the shortlist when fewer live rows exist
+        keep = np.isfinite(scores)
+        positions, scores = positions[keep], scores[keep]
+        
+        if rerank and self.quantizer is not None:
+            scores = self.embeddings[positions] @ query
+            best = top_k_indices(scores, top_k)
+            return positions[best], scores[best]
+        
+        return positions[:top_k], scores[:top_k]
+    
+    def _filtered_rows(self, allowed, budget):
+        """Rows passing a filter, when there are few enough to score them directly."""
+        selected = np.flatnonzero(allowed)
+        return selected if len(selected) <= budget else None
+    
+    def search(self, query, top_k=2, rerank=0, filters=None, **search_params):
+        """Return the positions and scores of the best live rows for a normalized query."""
+        allowed = self.allowed_rows(filters)
+        
+        # Let the index narrow down which rows are worth scoring
+        candidates = self.index.candidates(query, **search_params)
+        
+        # A selective filter is applied before scoring: its rows are scored
+        # directly, which beats a full scan and, unlike an IVF probe, cannot
+        # come back with fewer than top_k matches
+        if filters:
+            budget = len(self.ids) // 4 if candidates is None else len(candidates)
+            selected = self._filtered_rows(allowed, budget)
+            if selected is not None:
+                candidates, allowed = selected, None
+        
+        if candidates is not None and allowed is not None:
+            candidates = candidates[allowed[candidates]]
+        
+        # Cosine similarity against every candidate in one pass (a single BLAS
+        # call for float32 vectors, a table lookup or decode for quantized ones)
+        scores = self._approximate_scores(query, candidates)
+        if candidates is None and allowed is not None:
+            scores[~allowed] = -np.inf
+        
+        # Over-fetch when re-ranking so exact scores can reorder the shortlist;
+        # either way, select the best rows without sorting the whole corpus
+        best = top_k_indices(scores, max(top_k, rerank or 0))
+        positions = best if candidates is None else candidates[best]
+        
+        return self._finish(query, positions, scores[best], top_k, rerank)
+    
+    def search_batch(self, queries, top_k=2, rerank=0, block_size=65536, filters=None, **search_params):
+        """Search a matrix of normalized queries, returning (positions, scores) per query.
+        
+        With a flat index the segment is scored as a (block x queries) matrix
+        product, so each block of vectors or codes is read once for all
+        queries instead of once per query.
+        """
+        if not isinstance(self.index, FlatIndex):
+            # Each query probes different lists, so search them one at a time
+            return [
+                self.search(query, top_k=top_k, rerank=rerank, filters=filters, **search_params)
+                for query in queries
+            ]
+        
+        fetch = max(top_k, rerank or 0)
+        block_positions, block_scores = [], []
+        
+        # As in search(), a selective filter's rows are the only ones scored
+        allowed = self.allowed_rows(filters)
+        selected = self._filtered_rows(allowed, len(self.ids) // 4) if filters else None
+        
+        for start in range(0, len(self.ids) if selected is None else len(selected), block_size):
+            if selected is None:
+                rows = slice(start, start + block_size)
+                scores = self._approximate_scores(queries, rows).T
+                if allowed is not None:
+                    scores[:, ~allowed[rows]] = -np.inf
+            else:
+                rows = selected[start:start + block_size]
+                scores = self._approximate_scores(queries, rows).T
+            
+            # Keep only each query's best rows from this block
+            keep = min(fetch, scores.shape[1])
+            best = np.argpartition(-scores, keep - 1, axis=1)[:, :keep]
+            block_positions.append(best + start if selected is None else rows[best])
+            block_scores.append(np.take_along_axis(scores, best, axis=1))
+        
+        if not block_positions:
+            empty = np.empty(0, dtype=np.int64)
+            return [(empty, empty.astype(np.float32)) for _ in queries]
+        
+        positions = np.concatenate(block_positions, axis=1)
+        scores = np.concatenate(block_scores, axis=1)
+        
+        results = []
+        for query, query_positions, query_scores in zip(queries, positions, scores):
+            best = top_k_indices(query_scores, fetch)
+            results.append(self._finish(query, query_positions[best], query_scores[best], top_k, rerank))
+        return results
+
 # Mock vector database for demonstration
 class VectorDB:
-    def __init__(self):
-        # In a real implementation, this would load from a database
-        self.documents = [
-            {"id": 1, "title": "Introduction to Python", "content": "Python is a programming language..."},
-            {"id": 2, "title": "Machine Learning Basics", "content": "Machine learning is a subset of AI..."},
-            {"id": 3, "title": "Data Visualization", "content": "Visualizing data helps in understanding patterns..."}
-        ]
+    """A vector database made of immutable segments, LSM-style.
+    
+    An upsert tombstones the document's previous row and appends a new segment
+    holding the new version; a delete only adds the tombstone. Searches scan
+    every live segment and merge their results. Once there are more than
+    max_segments segments, or one is mostly tombstones, a background thread
+    compacts them into a single freshly indexed segment and swaps it in.
+    
+    Segments smaller than min_indexed_rows are kept flat and unquantized:
+    scanning them exactly is cheaper than training an index for them.
+    """
+    
+    def __init__(self, documents=None, ids=None, vectors=None, index_type="flat",
+                 quantization=None, quantization_params=None, min_indexed_rows=1024,
+                 max_segments=8, **index_params):
+        if documents is None:
+            # In a real implementation, this would load from a database
+            documents = [
+                {"id": 1, "title": "Introduction to Python", "content": "Python is a programming language...",
+                 "language": "en", "date": "2024-01-15"},
+                {"id": 2, "title": "Machine Learning Basics", "content": "Machine learning is a subset of AI...",
+                 "language": "en", "date": "2024-03-02"},
+                {"id": 3, "title": "Data Visualization", "content": "Visualizing data helps in understanding patterns...",
+                 "language": "en", "date": "2024-06-20"}
+            ]
+            
+            # Mock embeddings (in practice, these would be generated by an embedding model)
+            ids = [1, 2, 3]
+            vectors = [
+                [0.1, 0.2, 0.3],
+                [0.2, 0.3, 0.4],
+                [0.3, 0.4, 0.5]
+            ]
         
-        # Mock embeddings (in practice, these would be generated by an embedding model)
-        self.embeddings = {
-            1: np.array([0.1, 0.2, 0.3]),
-            2: np.array([0.2, 0.3, 0.4]),
-            3: np.array([0.3, 0.4, 0.5])
-        }
+        self._configure(index_type, index_params, quantization, quantization_params or {},
+                        min_indexed_rows, max_segments)
+        
+        # Line documents up with the matrix rows so results are looked up by position
+        documents_by_id = {doc["id"]: doc for doc in documents}
+        if len(ids):
+            self.segments = [self._build_segment([documents_by_id[int(doc_id)] for doc_id in ids], ids, vectors)]
     
-    def search(self, query_embedding, top_k=2):
-        # Calculate similarity scores
-        scores = {}
-        for doc_id, embedding in self.embeddings.items():
-            scores[doc_id] = 1 - cosine(query_embedding, embedding)  # Cosine similarity
+    def _configure(self, index_type, index_params, quantization, quantization_params,
+                   min_indexed_rows, max_segments, next_segment=0):
+        # Fail on a bad configuration now rather than on the first compaction
+        create_index(index_type, index_params)
+        create_quantizer(quantization, quantization_params)
+        
+        self.index_type = index_type
+        self.index_params = index_params
+        self.quantization = quantization
+        self.quantization_params = quantization_params
+        self.min_indexed_rows = min_indexed_rows
+        self.max_segments = max_segments
+        self.next_segment = next_segment
+        
+        # Searches read self.segments without locking: it is only ever replaced
+        # by a new list, never modified in place
+        self.segments = []
+        self.lock = threading.Lock()
+        self.compaction_lock = threading.Lock()  # one merge at a time
+        self.compacting = False
+    
+    def _build_segment(self, documents, ids, vectors):
+        with self.lock:
+            name = f"segment-{self.next_segment:06d}"
+            self.next_segment += 1
+        
+        if len(ids) < self.min_indexed_rows:
+            return Segment.build(name, documents, ids, vectors)
+        
+        return Segment.build(
+            name, documents, ids, vectors,
+            self.index_type, self.index_params,
+            self.quantization, self.quantization_params
+        )
+    
+    def __len__(self):
+        return sum(len(segment) for segment in self.segments)
+    
+    def save(self, path):
+        """Persist every segment (see Segment.save) plus a manifest listing them.
+        
+        Segments already memory-mapped from `path` are not rewritten, only their
+        tombstones; directories of segments that were compacted away are removed.
+        """
+        with self.lock:
+            segments = list(self.segments)
+        
+        os.makedirs(path, exist_ok=True)
+        for segment in segments:
+            directory = os.path.join(path, segment.name)
+            if segment.path == os.path.abspath(directory):
+                np.save(os.path.join(directory, "live.npy"), segment.live)
+            else:
+                segment.save(directory)
+        
+        # Swap the manifest in atomically so readers never see a partial store
+        manifest_path = os.path.join(path, "manifest.json")
+        with open(manifest_path + ".tmp", "w") as f:
+            json.dump({
+                "version": 2,
+                "segments": [segment.name for segment in segments],
+                "next_segment": self.next_segment,
+                "index_type": self.index_type,
+                "index_params": self.index_params,
+                "quantization": self.quantization,
+                "quantization_params": self.quantization_params,
+                "min_indexed_rows": self.min_indexed_rows,
+                "max_segments": self.max_segments
+            }, f, indent=2)
+        os.replace(manifest_path + ".tmp", manifest_path)
+        
+        names = {segment.name for segment in segments}
+        for entry in os.listdir(path):
+            if entry.startswith("segment-") and entry not in names:
+                shutil.rmtree(os.path.join(path, entry))
+    
+    @classmethod
+    def load(cls, path, index_type=None, **index_params):
+        """Open a store written by save(), memory-mapping each segment (see Segment.load).
+        
+        Passing index_type rebuilds the index of every indexed segment with it.
+        """
+        with open(os.path.join(path, "manifest.json")) as f:
+            manifest = json.load(f)
+        
+        db = cls.__new__(cls)
+        db._configure(
+            index_type or manifest["index_type"],
+            index_params if index_type else {**manifest["index_params"], **index_params},
+            manifest["quantization"],
+            manifest["quantization_params"],
+            manifest["min_indexed_rows"],
+            manifest["max_segments"],
+            manifest["next_segment"]
+        )
+        
+        segments = []
+        for name in manifest["segments"]:
+            segment = Segment.load(os.path.join(path, name))
+            if index_type is not None and len(segment.ids) >= db.min_indexed_rows:
+                segment = Segment.load(os.path.join(path, name), index_type, **index_params)
+            segments.append(segment)
+        db.segments = segments
+        
+        return db
+    
+    def upsert(self, documents, vectors):
+        """Insert documents (each with an "id"), replacing existing ones with the same id."""
+        # When an id repeats within the batch, its last version wins
+        latest = {doc["id"]: i for i, doc in enumerate(documents)}
+        rows = sorted(latest.values())
+        documents = [documents[i] for i in rows]
+        ids = [doc["id"] for doc in documents]
+        
+        if not ids:
+            return
+        
+        # Built outside the lock; the new segment is invisible until appended
+        segment = self._build_segment(documents, ids, np.asarray(vectors)[rows])
         
-        # Sort by score
-        sorted_ids = sorted(scores.keys(), key=lambda x: scores[x], reverse=True)[:top_k]
+        with self.lock:
+            for doc_id in ids:
+                self._tombstone(doc_id)
+            self.segments = self.segments + [segment]
+        
+        self._maybe_compact()
+    
+    def delete(self, doc_ids):
+        """Delete documents by id, returning how many were found."""
+        with self.lock:
+            deleted = sum(self._tombstone(doc_id) for doc_id in doc_ids)
+        
+        self._maybe_compact()
+        return deleted
+    
+    def _tombstone(self, doc_id):
+        found = 0
+        for segment in self.segments:
+            positions = segment.positions_of(doc_id)
+            segment.tombstone(positions)
+            found += len(positions)
+        return found
+    
+    def _compaction_plan(self):
+        """Pick segments to merge: mostly-deleted ones, plus the smallest ones when
+        there are more than max_segments."""
+        plan = [segment for segment in self.segments if segment.deleted > len(segment.ids) / 2]
+        
+        if len(self.segments) > self.max_segments:
+            by_size = sorted(self.segments, key=len)
+            smallest = by_size[:len(self.segments) - self.max_segments // 2]
+            plan += [segment for segment in smallest if not any(segment is p for p in plan)]
+        
+        return plan
+    
+    def _maybe_compact(self):
+        with self.lock:
+            if self.compacting or not self._compaction_plan():
+                return
+            self.compacting = True
+        
+        threading.Thread(target=self._run_compaction, daemon=True).start()
+    
+    def _run_compaction(self):
+        try:
+            while True:
+                with self.lock:
+                    plan = self._compaction_plan()
+                    if not plan:
+                        self.compacting = False
+                        return
+                self.compact(plan)
+        except Exception:
+            with self.lock:
+                self.compacting = False
+            raise
+    
+    def compact(self, segments=None):
+        """Merge segments (all of them by default) into one, dropping tombstoned rows.
+        
+        Searches keep using the old segments until the merged one is swapped in.
+        """
+        with self.compaction_lock:
+            self._compact(segments)
+    
+    def _compact(self, segments):
+        with self.lock:
+            # Skip segments another compaction already merged away
+            current = self.segments
+            if segments is not None:
+                current = [segment for segment in current if any(segment is s for s in segments)]
+            segments = list(current)
+            rows = [np.flatnonzero(segment.live) for segment in segments]
+        
+        if not segments:
+            return
+        
+        merged = None
+        if sum(len(positions) for positions in rows):
+            merged = self._build_segment(
+                [segment.documents[int(p)] for segment, positions in zip(segments, rows) for p in positions],
+                np.concatenate([segment.ids[positions] for segment, positions in zip(segments, rows)]),
+                np.concatenate([segment.embeddings[positions] for segment, positions in zip(segments, rows)])
+            )
+        
+        with self.lock:
+            # Rows deleted or replaced while merging must stay deleted
+            if merged is not None:
+                merged.live = np.concatenate([segment.live[positions] for segment, positions in zip(segments, rows)])
+                merged.deleted = int(len(merged.live) - np.count_nonzero(merged.live))
+            
+            remaining = [segment for segment in self.segments if not any(segment is s for s in segments)]
+            
+            # Index the fields the old segments were filtered on, so the first
+            # filtered query after the swap does not pay for it
+            if merged is not None:
+                for segment in segments:
+                    for field in segment.metadata_index.fields:
+                        merged.metadata_index.field(field)
+            self.segments = remaining + ([merged] if merged is not None else [])
+    
+    def memory_usage(self):
+        """Bytes used by the float32 vectors and by the codes that searches scan."""
+        usage = {"vectors": 0, "codes": 0}
+        for segment in self.segments:
+            for key, value in segment.memory_usage().items():
+                usage[key] += value
+        return usage
+    
+    def _merge(self, segment_hits, top_k):
+        # Each segment returned its own best rows; keep the best across segments
+        hits = [
+            (float(score), segment, int(position))
+            for segment, (positions, scores) in segment_hits
+            for position, score in zip(positions, scores)
+        ]
+        hits.sort(key=lambda hit: hit[0], reverse=True)
         
         # Return documents
         return [
-            {**self.documents[doc_id-1], "score": scores[doc_id]}
-            for doc_id in sorted_ids
+            {**segment.documents[position], "score": score}
+            for score, segment, position in hits[:top_k]
+        ]
+    
+    def search(self, query_embedding, top_k=2, rerank=0, filters=None, **search_params):
+        """Find the documents closest to a query embedding.
+        
+        filters restricts results by metadata, e.g. {"tenant": "acme",
+        "language": ["en", "de"], "date": {"gte": "2024-01-01"}}.
+        """
+        query = normalize(query_embedding)
+        segments = self.segments
+        
+        return self._merge(
+            [(segment, segment.search(query, top_k, rerank, filters, **search_params)) for segment in segments],
+            top_k
+        )
+    
+    def search_batch(self, query_embeddings, top_k=2, rerank=0, block_size=65536, filters=None, **search_params):
+        """Search many queries at once, returning one result list per query."""
+        queries = normalize(query_embeddings)
+        segments = self.segments
+        
+        per_segment = [
+            segment.search_batch(queries, top_k, rerank, block_size, filters, **search_params)
+            for segment in segments
+        ]
+        
+        return [
+            self._merge([(segment, hits[i]) for segment, hits in zip(segments, per_segment)], top_k)
+            for i in range(len(queries))
         ]
+    
+    def keyword_search(self, query_text, top_k=2, filters=None):
+        """Rank documents by BM25 over their title and content."""
+        terms = set(tokenize(query_text))
+        segments = self.segments
+        
+        # Collection-wide statistics keep scores comparable across segments
+        # (tombstoned rows count until compaction removes them, as in Lucene)
+        total_docs = sum(len(segment.ids) for segment in segments)
+        if not terms or not total_docs or top_k <= 0:
+            return []
+        avgdl = max(sum(segment.keyword_index.total_length for segment in segments) / total_docs, 1.0)
+        
+        idfs = {}
+        for term in terms:
+            df = sum(segment.keyword_index.doc_freq(term) for segment in segments)
+            if df:
+                idfs[term] = float(np.log(1 + (total_docs - df + 0.5) / (df + 0.5)))
+        
+        # Largest segments first, so later ones start from a high threshold
+        hits, threshold = [], 0.0
+        for segment in sorted(segments, key=len, reverse=True):
+            allowed = segment.allowed_rows(filters)
+            rows, scores = segment.keyword_index.search(
+                idfs, avgdl, segment.live if allowed is None else allowed, top_k, threshold
+            )
+            hits.append((segment, (rows, scores)))
+            
+            found = np.concatenate([scores for _, (_, scores) in hits])
+            if len(found) >= top_k:
+                threshold = float(np.partition(found, -top_k)[-top_k])
+        
+        return self._merge(hits, top_k)
+    
+    def hybrid_search(self, query_embedding, query_text, top_k=2, rerank=0, candidates=50, filters=None,
+                      **search_params):
+        """Fuse vector and BM25 rankings with reciprocal rank fusion (k=60).
+        
+        RRF only uses ranks, so the differently scaled cosine and BM25 scores
+        need no normalization.
+        """
+        if top_k <= 0:
+            return []
+        fetch = max(top_k, candidates)
+        fused = {}
+        for results in (
+            self.search(query_embedding, top_k=fetch, rerank=rerank, filters=filters, **search_params),
+            self.keyword_search(query_text, top_k=fetch, filters=filters)
+        ):
+            for rank, doc in enumerate(results):
+                entry = fused.setdefault(doc["id"], {**doc, "score": 0.0})
+                entry["score"] += 1 / (60 + rank + 1)
+        
+        return sorted(fused.values(), key=lambda doc: doc["score"], reverse=True)[:top_k]
+    
+    def exact_search(self, query_embedding, top_k=2):
+        """Ids of the true top_k documents, from a float32 scan of every live row."""
+        query = normalize(query_embedding)
+        hits = []
+        for segment in self.segments:
+            scores = segment.embeddings @ query
+            if segment.deleted:
+                scores[~segment.live] = -np.inf
+            best = top_k_indices(scores, top_k)
+            best = best[np.isfinite(scores[best])]
+            hits.append((segment, (best, scores[best])))
+        return [doc["id"] for doc in self._merge(hits, top_k)]
+    
+    def sample_vectors(self, count, seed=0):
+        """Stored vectors of randomly chosen live documents."""
+        rng = np.random.default_rng(seed)
+        segments = [segment for segment in self.segments if len(segment)]
+        weights = np.array([len(segment) for segment in segments], dtype=np.float64)
+        
+        samples = []
+        for index in rng.choice(len(segments), count, p=weights / weights.sum()):
+            segment = segments[index]
+            samples.append(segment.embeddings[rng.choice(np.flatnonzero(segment.live))])
+        return np.stack(samples)
 
-# Initialize vector database
-vector_db = VectorDB()
+# In a real implementation, query embeddings would come from an embedding model
+def mock_get_embedding(text):
+    # This is a placeholder; real embeddings would come from a model
+    return np.array([0.2, 0.3, 0.4])
 
-@mcp.tool()
-async def semantic_search(query: str, top_k: int = 2) -> str:
-    """Search documents semantically based on meaning, not just keywords.
+def mock_get_embeddings(texts):
+    # Embedding models take a list of texts, so a batch costs one model call
+    return np.stack([mock_get_embedding(text) for text in texts])
+
+class EmbeddingCache:
+    """LRU cache of query embeddings keyed by a hash of the normalized query text.
     
-    Args:
-        query: Search query
-        top_k: Number of top results to return
+    Entries expire after ttl_seconds, and the least recently used entry is
+    evicted once max_entries is reached.
     """
-    # In a real implementation, we would generate the query embedding here
-    # For this example, we'll simulate it with a simple function
-    def mock_get_embedding(text):
-        # This is a placeholder; real embeddings would come from a model
-        return np.array([0.2, 0.3, 0.4])
     
-    query_embedding = mock_get_embedding(query)
+    def __init__(self, max_entries=10000, ttl_seconds=3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.entries = OrderedDict()  # key -> (expires_at, embedding)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
     
-    # Search the vector database
-    results = vector_db.search(query_embedding, top_k=top_k)
+    @staticmethod
+    def key(text):
+        # Case and whitespace differences should not cost another model call
+        normalized = " ".join(text.lower().split())
+        return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
     
-    # Format results
+    def get(self, text):
+        key = self.key(text)
+        entry = self.entries.get(key)
+        
+        if entry is None or entry[0] < time.time():
+            if entry is not None:
+                del self.entries[key]
+            self.misses += 1
+            return None
+        
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+    
+    def put(self, text, embedding):
+        embedding = np.array(embedding, dtype=np.float32)
+        embedding.setflags(write=False)  # shared between callers
+        
+        key = self.key(text)
+        self.entries[key] = (time.time() + self.ttl_seconds, embedding)
+        self.entries.move_to_end(key)
+        
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+        
+        return embedding
+    
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+embedding_cache = EmbeddingCache(EMBEDDING_CACHE_SIZE, EMBEDDING_CACHE_TTL_SECONDS)
+
+def get_query_embedding(text):
+    embedding = embedding_cache.get(text)
+    if embedding is None:
+        embedding = embedding_cache.put(text, mock_get_embedding(text))
+    return embedding
+
+def get_query_embeddings(texts):
+    embeddings = [embedding_cache.get(text) for text in texts]
+    
+    # Send each distinct cache miss to the model once, still as a single batch
+    missing = {}
+    for i, embedding in enumerate(embeddings):
+        if embedding is None:
+            missing.setdefault(embedding_cache.key(texts[i]), []).append(i)
+    
+    if missing:
+        groups = list(missing.values())
+        for positions, embedding in zip(groups, mock_get_embeddings([texts[group[0]] for group in groups])):
+            embedding = embedding_cache.put(texts[positions[0]], embedding)
+            for i in positions:
+                embeddings[i] = embedding
+    
+    return np.stack(embeddings)
+
+def format_results(results):
     formatted_results = []
     for i, doc in enumerate(results):
         formatted_results.append(
@@ -70,3 +1500,201 @@ async def semantic_search(query: str, top_k: int = 2) -> str:
         return "No matching documents found."
     
     return "Search results:\n\n" + "\n\n".join(formatted_results)
+
+# Initialize vector database
+if os.path.exists(os.path.join(STORE_PATH, "manifest.json")):
+    vector_db = VectorDB.load(STORE_PATH)
+else:
+    vector_db = VectorDB(
+        index_type=INDEX_TYPE,
+        quantization=QUANTIZATION,
+        quantization_params=QUANTIZATION_PARAMS,
+        **INDEX_PARAMS
+    )
+
+@mcp.tool()
+async def semantic_search(query: str, top_k: int = 2, nprobe: int = None, rerank: int = 0,
+                          mode: str = "vector", filters: dict = None) -> str:
+    """Search documents semantically based on meaning, not just keywords.
+    
+    Args:
+        query: Search query
+        top_k: Number of top results to return
+        nprobe: Clusters to scan when using an IVF index (higher is slower but more accurate)
+        rerank: Candidates to re-score with exact vectors when quantization is enabled
+        mode: "vector" (meaning), "keyword" (BM25, best for exact identifiers) or "hybrid" (both fused)
+        filters: Metadata conditions, e.g. {"language": ["en", "de"], "date": {"gte": "2024-01-01"}}
+    """
+    allowed_modes = ["vector", "keyword", "hybrid"]
+    if mode not in allowed_modes:
+        return f"Invalid mode. Must be one of: {', '.join(allowed_modes)}"
+    
+    if top_k < 1:
+        return "Invalid top_k. Must be at least 1"
+    
+    if nprobe is not None and nprobe < 1:
+        return "Invalid nprobe. Must be at least 1"
+    
+    if filters:
+        try:
+            check_filters(filters)
+        except ValueError as e:
+            return f"Invalid filters: {str(e)}"
+    
+    # Search the vector database
+    if mode == "keyword":
+        results = vector_db.keyword_search(query, top_k=top_k, filters=filters)
+    elif mode == "hybrid":
+        results = vector_db.hybrid_search(
+            get_query_embedding(query), query, top_k=top_k, rerank=rerank, filters=filters, nprobe=nprobe
+        )
+    else:
+        results = vector_db.search(
+            get_query_embedding(query), top_k=top_k, rerank=rerank, filters=filters, nprobe=nprobe
+        )
+    
+    return format_results(results)
+
+@mcp.tool()
+async def semantic_search_batch(queries: list[str], top_k: int = 2, nprobe: int = None, rerank: int = 0,
+                                filters: dict = None) -> str:
+    """Run several semantic searches in one call, e.g. for the sub-questions of a larger question.
+    
+    Args:
+        queries: Search queries
+        top_k: Number of top results to return per query
+        nprobe: Clusters to scan when using an IVF index (higher is slower but more accurate)
+        rerank: Candidates to re-score with exact vectors when quantization is enabled
+        filters: Metadata conditions applied to every query (see semantic_search)
+    """
+    if not queries:
+        return "Error: No queries provided."
+    
+    if top_k < 1:
+        return "Invalid top_k. Must be at least 1"
+    
+    if nprobe is not None and nprobe < 1:
+        return "Invalid nprobe. Must be at least 1"
+    
+    if filters:
+        try:
+            check_filters(filters)
+        except ValueError as e:
+            return f"Invalid filters: {str(e)}"
+    
+    # Embed all queries together and score them against the corpus in one pass
+    query_embeddings = get_query_embeddings(queries)
+    batch_results = vector_db.search_batch(
+        query_embeddings, top_k=top_k, rerank=rerank, filters=filters, nprobe=nprobe
+    )
+    
+    sections = []
+    for i, (query, results) in enumerate(zip(queries, batch_results)):
+        sections.append(f"Query {i+1}: {query}\n" + format_results(results))
+    
+    return "\n\n---\n\n".join(sections)
+
+@mcp.tool()
+async def upsert_document(doc_id: int, title: str, content: str, metadata: dict = None) -> str:
+    """Add a document to the search index, replacing any existing document with the same ID.
+    
+    Args:
+        doc_id: Document identifier
+        title: Document title
+        content: Document text
+        metadata: Optional filterable fields such as tenant, language or date
+    """
+    document = {**(metadata or {}), "id": doc_id, "title": title, "content": content}
+    
+    # Document embeddings would come from the same model as query embeddings
+    vector_db.upsert([document], [mock_get_embedding(content)])
+    
+    return f"Document {doc_id} indexed."
+
+@mcp.tool()
+async def delete_document(doc_id: int) -> str:
+    """Remove a document from the search index.
+    
+    Args:
+        doc_id: Document identifier
+    """
+    if not vector_db.delete([doc_id]):
+        return f"Error: Document {doc_id} not found."
+    
+    return f"Document {doc_id} deleted."
+
+@mcp.tool()
+async def vector_db_stats() -> str:
+    """Get the segments of the vector database with their live and deleted document counts."""
+    segments = vector_db.segments
+    
+    lines = []
+    for segment in segments:
+        lines.append(
+            f"- {segment.name}: {len(segment)} live, {segment.deleted} deleted "
+            f"({segment.index_type} index, {segment.quantization or 'float32'})"
+        )
+    
+    status = "compaction running" if vector_db.compacting else "idle"
+    return f"{len(vector_db)} documents in {len(segments)} segments ({status}):\n" + "\n".join(lines)
+
+@mcp.tool()
+async def embedding_cache_stats() -> str:
+    """Get hit/miss statistics for the query embedding cache."""
+    stats = embedding_cache.stats()
+    return (
+        f"Embedding cache: {stats['entries']}/{stats['max_entries']} entries "
+        f"(TTL {stats['ttl_seconds']}s)\n"
+        f"- Hits: {stats['hits']}\n"
+        f"- Misses: {stats['misses']}\n"
+        f"- Evictions: {stats['evictions']}\n"
+        f"- Hit rate: {stats['hit_rate']:.1%}"
+    )
+
+@mcp.tool()
+async def evaluate_search_quality(num_queries: int = 100, top_k: int = 10, nprobe: int = None, rerank: int = 0) -> str:
+    """Measure recall and latency of the configured index and quantization against exact search.
+    
+    Args:
+        num_queries: Number of sample queries (stored vectors with noise added)
+        top_k: Number of results compared per query
+        nprobe: Clusters to scan when using an IVF index
+        rerank: Candidates to re-score with exact vectors when quantization is enabled
+    """
+    if len(vector_db) == 0:
+        return "Error: The vector database is empty."
+    
+    if num_queries < 1:
+        return "Invalid num_queries. Must be at least 1"
+    
+    if top_k < 1:
+        return "Invalid top_k. Must be at least 1"
+    
+    if nprobe is not None and nprobe < 1:
+        return "Invalid nprobe. Must be at least 1"
+    
+    rng = np.random.default_rng(0)
+    queries = vector_db.sample_vectors(num_queries)
+    queries = queries + 0.1 * rng.standard_normal(queries.shape).astype(np.float32)
+    
+    recalls, exact_ms, search_ms = [], [], []
+    for query in queries:
+        start = time.perf_counter()
+        expected = set(vector_db.exact_search(query, top_k))
+        exact_ms.append((time.perf_counter() - start) * 1000)
+        
+        start = time.perf_counter()
+        results = vector_db.search(query, top_k=top_k, rerank=rerank, nprobe=nprobe)
+        search_ms.append((time.perf_counter() - start) * 1000)
+        
+        recalls.append(len(expected & {doc["id"] for doc in results}) / len(expected))
+    
+    memory = vector_db.memory_usage()
+    
+    return (
+        f"Evaluated {num_queries} queries at top_k={top_k}:\n"
+        f"- Recall@{top_k}: {np.mean(recalls):.3f}\n"
+        f"- Mean latency: {np.mean(search_ms):.3f} ms (exact float32 scan: {np.mean(exact_ms):.3f} ms)\n"
+        f"- Scanned vector memory: {memory['codes']:,} bytes "
+        f"({memory['vectors'] / memory['codes']:.1f}x smaller than {memory['vectors']:,} bytes of float32)"
+    )